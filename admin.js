@@ -6,6 +6,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const searchInput = document.getElementById('search-users');
     const logoutButton = document.getElementById('logout-button');
     const usersTableBody = document.getElementById('users-table-body');
+    const loadMoreBtn = document.getElementById('load-more-users');
+    const usersCount = document.getElementById('users-count');
     const modalTitle = document.getElementById('modal-title');
     const closeModalBtns = document.querySelectorAll('[data-bs-dismiss="modal"]');
 
@@ -18,10 +20,16 @@ document.addEventListener('DOMContentLoaded', () => {
     searchInput.addEventListener('input', handleSearch);
     logoutButton.addEventListener('click', handleLogout);
     closeModalBtns.forEach(btn => btn.addEventListener('click', closeModal));
+    loadMoreBtn.addEventListener('click', () => loadUsers(true));
 
     // Variables
+    const PAGE_SIZE = 50;
     let editingUserId = null;
     let users = [];
+    let nextCursor = null;
+    let searchTerm = '';
+    let searchTimer = null;
+    let loadRequest = 0;
 
     // Check auth and load users
     checkAdminAuth();
@@ -42,17 +50,35 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    async function loadUsers() {
+    // Charge la première page, ou la suivante si append est vrai
+    async function loadUsers(append = false) {
+        const request = ++loadRequest;
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        if (searchTerm) params.set('search', searchTerm);
+        if (append && nextCursor) params.set('cursor', nextCursor);
+
         try {
-            const response = await fetch('/api/users');
+            loadMoreBtn.disabled = true;
+            const response = await fetch(`/api/users?${params}`);
             if (!response.ok) {
                 throw new Error('Erreur lors du chargement des utilisateurs');
             }
-            users = await response.json();
+            const page = await response.json();
+            // Une recherche plus récente a été lancée entre-temps
+            if (request !== loadRequest) return;
+
+            users = append ? users.concat(page.users) : page.users;
+            nextCursor = page.next_cursor;
             renderUsers(users);
+            loadMoreBtn.classList.toggle('d-none', !nextCursor);
+            usersCount.textContent = page.total !== null
+                ? `${users.length} affichés sur environ ${page.total}`
+                : `${users.length} résultat${users.length > 1 ? 's' : ''}${nextCursor ? ' ou plus' : ''}`;
         } catch (error) {
             console.error('Erreur:', error);
             alert(error.message);
+        } finally {
+            loadMoreBtn.disabled = false;
         }
     }
 
@@ -89,7 +115,8 @@ document.addEventListener('DOMContentLoaded', () => {
         const formData = {
             username: document.getElementById('username').value.trim(),
             password: document.getElementById('password').value,
-            is_admin: document.getElementById('is-admin').checked
+            is_admin: document.getElementById('is-admin').checked,
+            quota: document.getElementById('quota').value.trim()
         };
 
         if (!formData.username) {
@@ -135,6 +162,7 @@ document.addEventListener('DOMContentLoaded', () => {
             document.getElementById('username').value = user.username;
             document.getElementById('password').value = '';
             document.getElementById('is-admin').checked = user.is_admin;
+            document.getElementById('quota').value = user.quota || '';
             modal.show();
         }
     };
@@ -160,11 +188,12 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     function handleSearch(e) {
-        const searchTerm = e.target.value.toLowerCase();
-        const filteredUsers = users.filter(user =>
-            user.username.toLowerCase().includes(searchTerm)
-        );
-        renderUsers(filteredUsers);
+        // Recherche par préfixe côté serveur, après une courte pause de frappe
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => {
+            searchTerm = e.target.value.trim();
+            loadUsers();
+        }, 250);
     }
 
     async function handleLogout() {
@@ -0,0 +1,89 @@
+import os
+import json
+import mimetypes
+from flask import abort, request, send_file
+from build_assets import ROOT, DIST, PAGES, ASSETS
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# Suffixe des variantes précompressées, par ordre de préférence
+VARIANTS = [('br', '.br'), ('gzip', '.gz')]
+
+
+class StaticAssets:
+    """Fichiers statiques autorisés, servis depuis dist/ quand il existe
+
+    Seuls les chemins listés ici sont servis : les sources Python, .env ou
+    la configuration ne sont jamais accessibles par l'URL.
+    """
+
+    def __init__(self, root=ROOT, dist=DIST):
+        self.root = root
+        self.dist = dist
+        self.files = {}
+        self.load()
+
+    def load(self):
+        files = {}
+        # Noms d'origine, sans empreinte : toujours revalidés par le navigateur
+        for name in PAGES + ASSETS:
+            files[name] = {
+                'path': os.path.join(self.root, name),
+                'etag': None,
+                'encodings': [],
+                'cache_control': REVALIDATE
+            }
+
+        manifest_path = os.path.join(self.dist, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            for name, entry in manifest['assets'].items():
+                files[name] = self._entry(name, entry, IMMUTABLE)
+            for name, entry in manifest['pages'].items():
+                files[name] = self._entry(name, entry, REVALIDATE)
+
+        self.files = files
+        self.built = os.path.exists(manifest_path)
+
+    def _entry(self, name, entry, cache_control):
+        return {
+            'path': os.path.join(self.dist, name),
+            'etag': entry['etag'],
+            'encodings': entry['encodings'],
+            'cache_control': cache_control
+        }
+
+    def _choose_encoding(self, entry):
+        for encoding, suffix in VARIANTS:
+            if encoding in entry['encodings'] and request.accept_encodings[encoding]:
+                return encoding, entry['path'] + suffix
+        return None, entry['path']
+
+    def serve(self, name):
+        entry = self.files.get(name)
+        if entry is None:
+            abort(404)
+
+        encoding, path = self._choose_encoding(entry)
+        etag = entry['etag']
+        if etag and encoding:
+            # Une ETag par variante, les octets envoyés diffèrent
+            etag = f'{etag}-{encoding}'
+
+        response = send_file(
+            path,
+            mimetype=mimetypes.guess_type(name)[0],
+            etag=etag or True,
+            conditional=True
+        )
+        response.headers['Cache-Control'] = entry['cache_control']
+        if entry['encodings']:
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+
+static_assets = StaticAssets()
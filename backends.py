@@ -0,0 +1,248 @@
+import os
+import logging
+import threading
+import requests
+from dotenv import load_dotenv
+
+from ollama_client import OllamaClient, OllamaError
+from timing import instrument
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class NoBackendAvailable(OllamaError):
+    """Aucun nœud Ollama sain ne peut servir la requête"""
+
+    def __init__(self, model=None):
+        super().__init__(f'Aucun serveur Ollama disponible pour {model}' if model else 'Aucun serveur Ollama disponible', 503)
+
+
+class Backend:
+    """Un nœud Ollama, son état de santé et ses requêtes en cours"""
+
+    def __init__(self, host, port, **client_options):
+        self.name = f'{host}:{port}'
+        self.client = OllamaClient(host=host, port=port, **client_options)
+        self.healthy = True
+        self.failures = 0
+        self.outstanding = 0
+        self.installed = set()
+        self.loaded = {}
+
+
+class _TrackedStream:
+    """Flux de fragments qui libère le nœud à sa fermeture"""
+
+    def __init__(self, pool, backend, chunks):
+        self._pool = pool
+        self._backend = backend
+        self._chunks = chunks
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except requests.ConnectionError:
+            self._pool._mark_failure(self._backend)
+            raise
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._chunks.close()
+            self._pool._finish(self._backend)
+
+
+class BackendPool:
+    """Répartit les appels Ollama entre plusieurs nœuds
+
+    Le routage choisit le nœud sain ayant le moins de requêtes en cours, en
+    préférant ceux qui ont déjà le modèle en mémoire. Les nœuds en échec sont
+    écartés puis réadmis par le contrôle de santé périodique.
+    """
+
+    def __init__(self, nodes=None, health_interval=None, max_failures=None):
+        if nodes is None:
+            nodes = parse_backends(os.getenv('OLLAMA_BACKENDS', ''))
+        if not nodes:
+            nodes = [(os.getenv('OLLAMA_HOST', 'localhost'), os.getenv('OLLAMA_PORT', '11434'))]
+        self.backends = [Backend(host, port) for host, port in nodes]
+        self.health_interval = float(health_interval or os.getenv('OLLAMA_HEALTH_INTERVAL', 10))
+        self.max_failures = int(max_failures or os.getenv('OLLAMA_MAX_FAILURES', 3))
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    # Routage
+
+    def _acquire(self, model=None, exclude=()):
+        name = model.replace(':latest', '') if model else None
+        with self._lock:
+            candidates = [b for b in self.backends if b.healthy and b not in exclude]
+            if name:
+                # Uniquement les nœuds où le modèle est installé, si on le sait
+                installed = [b for b in candidates if name in b.installed]
+                candidates = installed or candidates
+            if not candidates:
+                raise NoBackendAvailable(model)
+            backend = min(
+                candidates,
+                key=lambda b: (name not in b.loaded if name else False, b.outstanding)
+            )
+            backend.outstanding += 1
+            return backend
+
+    def _finish(self, backend):
+        with self._lock:
+            backend.outstanding -= 1
+
+    def _mark_failure(self, backend):
+        with self._lock:
+            backend.failures += 1
+            if backend.healthy and backend.failures >= self.max_failures:
+                backend.healthy = False
+                logger.warning(f'Nœud Ollama écarté: {backend.name}')
+
+    def _mark_success(self, backend):
+        with self._lock:
+            backend.failures = 0
+            if not backend.healthy:
+                backend.healthy = True
+                logger.info(f'Nœud Ollama réadmis: {backend.name}')
+
+    def _call(self, model, method, *args, **kwargs):
+        """Appelle un nœud, puis un autre si la connexion échoue"""
+        tried = []
+        while True:
+            backend = self._acquire(model, exclude=tried)
+            try:
+                return backend, getattr(backend.client, method)(*args, **kwargs)
+            except requests.ConnectionError:
+                self._mark_failure(backend)
+                tried.append(backend)
+                if len(tried) >= len(self.backends):
+                    raise
+            finally:
+                self._finish(backend)
+
+    # API Ollama
+
+    def chat(self, model, messages, **kwargs):
+        return self._call(model, 'chat', model, messages, **kwargs)[1]
+
+    def chat_stream(self, model, messages, **kwargs):
+        backend = self._acquire(model)
+        try:
+            chunks = backend.client.chat_stream(model, messages, **kwargs)
+        except Exception as e:
+            if isinstance(e, requests.ConnectionError):
+                self._mark_failure(backend)
+            self._finish(backend)
+            raise
+        return _TrackedStream(self, backend, chunks)
+
+    def embed(self, model, inputs):
+        return self._call(model, 'embed', model, inputs)[1]
+
+    def show(self, name):
+        return self._call(name, 'show', name)[1]
+
+    def tags(self):
+        """Fusionne /api/tags de tous les nœuds sains"""
+        models = {}
+        for backend in self._healthy():
+            try:
+                for model in backend.client.tags():
+                    models.setdefault(model['name'], model)
+            except (requests.RequestException, OllamaError) as e:
+                logger.warning(f'Erreur /api/tags sur {backend.name}: {str(e)}')
+        if not models and not self._healthy():
+            raise NoBackendAvailable()
+        return list(models.values())
+
+    def ps(self):
+        """Fusionne /api/ps de tous les nœuds sains"""
+        models = {}
+        for backend in self._healthy():
+            try:
+                for model in backend.client.ps():
+                    models.setdefault(model['name'], model)
+            except (requests.RequestException, OllamaError) as e:
+                logger.warning(f'Erreur /api/ps sur {backend.name}: {str(e)}')
+        return list(models.values())
+
+    def _healthy(self):
+        with self._lock:
+            return [b for b in self.backends if b.healthy]
+
+    # Contrôle de santé
+
+    def check(self, backend):
+        """Interroge le nœud : installés (/api/tags) et chargés (/api/ps)"""
+        try:
+            installed = {m['name'].replace(':latest', '') for m in backend.client.tags()}
+            loaded = {m['name'].replace(':latest', ''): m for m in backend.client.ps()}
+        except (requests.RequestException, OllamaError):
+            self._mark_failure(backend)
+            return False
+        with self._lock:
+            backend.installed = installed
+            backend.loaded = loaded
+        self._mark_success(backend)
+        return True
+
+    def check_all(self):
+        for backend in self.backends:
+            self.check(backend)
+
+    def start(self):
+        """Démarre le contrôle de santé périodique en arrière-plan"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='ollama-health', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self.check_all()
+        while not self._stop.wait(self.health_interval):
+            self.check_all()
+
+    def status(self):
+        with self._lock:
+            return [
+                {
+                    'name': b.name,
+                    'healthy': b.healthy,
+                    'outstanding': b.outstanding,
+                    'failures': b.failures,
+                    'loaded': sorted(b.loaded)
+                }
+                for b in self.backends
+            ]
+
+
+def parse_backends(value):
+    """Analyse "gpu1:11434,gpu2" en [('gpu1', '11434'), ('gpu2', '11434')]"""
+    nodes = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, sep, port = item.partition(':')
+        nodes.append((host, port if sep else '11434'))
+    return nodes
+
+
+# Pool partagé par toutes les routes
+backend_pool = instrument(BackendPool(), 'ollama', ('chat', 'chat_stream', 'embed', 'show', 'tags', 'ps'))
@@ -0,0 +1,42 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', 4))
+
+
+def fan_out(items, worker, concurrency):
+    """Exécute worker(item) en parallèle, au plus concurrency à la fois
+
+    Renvoie (index, résultat, erreur) dans l'ordre de terminaison. Seuls
+    concurrency éléments sont soumis à la fois : si le client se déconnecte
+    et que le générateur est fermé, le reste du lot n'est jamais lancé.
+    """
+    items = iter(enumerate(items))
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch')
+    pending = {}
+
+    def submit():
+        for index, item in items:
+            pending[executor.submit(worker, item)] = index
+            return True
+        return False
+
+    try:
+        for _ in range(concurrency):
+            if not submit():
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                yield index, None if error else future.result(), error
+                submit()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1 @@
+"""Benchmarks de charge reproductibles (Ollama et base de données factices)"""
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Lance les scénarios de charge contre wsgi.application
+
+    python -m bench --configs 1x8,2x4 --scenarios login,preferences,models,chat
+
+Chaque configuration "WxT" démarre gunicorn avec W workers et T threads
+(ou "werkzeug" pour le serveur de développement threadé), sur une base de
+données en mémoire et un Ollama factice. Le résultat est écrit en JSON pour
+comparer les exécutions d'un commit à l'autre.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from bench.report import git_commit, percentile
+from bench.scenarios import SCENARIOS
+from bench.stub_ollama import StubOllama
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{base_url}/api/auth/check', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f'Le serveur {base_url} ne répond pas')
+
+
+class AppServer:
+    """Démarre l'application sous gunicorn ou werkzeug pour une configuration"""
+
+    def __init__(self, config, env):
+        self.config = config
+        self.env = env
+        self.port = free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        self._process = None
+        self._server = None
+
+    def __enter__(self):
+        if self.config == 'werkzeug':
+            self._start_werkzeug()
+        else:
+            workers, _, threads = self.config.partition('x')
+            self._process = subprocess.Popen(
+                [
+                    sys.executable, '-m', 'gunicorn',
+                    '--workers', workers,
+                    '--threads', threads or '1',
+                    '--bind', f'127.0.0.1:{self.port}',
+                    '--log-level', 'warning',
+                    'bench.app:application'
+                ],
+                cwd=ROOT,
+                env={**os.environ, **self.env}
+            )
+        wait_ready(self.base_url)
+        return self
+
+    def _start_werkzeug(self):
+        from werkzeug.serving import make_server
+
+        os.environ.update(self.env)
+        from bench import app  # noqa: F401 (installe la base factice)
+        self._server = make_server('127.0.0.1', self.port, app.application, threaded=True)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def __exit__(self, *exc):
+        if self._process:
+            self._process.terminate()
+            self._process.wait(timeout=30)
+        if self._server:
+            self._server.shutdown()
+
+
+def run_scenario(base_url, scenario_cls, concurrency, duration, warmup):
+    samples = []
+    lock = threading.Lock()
+    start_at = time.monotonic() + warmup
+    stop_at = start_at + duration
+
+    def user(index):
+        scenario = scenario_cls(base_url, index)
+        try:
+            scenario.setup()
+            while time.monotonic() < stop_at:
+                results = scenario.step()
+                if time.monotonic() >= start_at:
+                    with lock:
+                        samples.extend(results)
+        finally:
+            scenario.close()
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, duration):
+    by_name = {}
+    for name, status, latency in samples:
+        by_name.setdefault(name, []).append((status, latency))
+
+    summary = {}
+    for name, entries in by_name.items():
+        latencies = sorted(latency for _, latency in entries)
+        statuses = {}
+        for status, _ in entries:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        summary[name] = {
+            'requests': len(entries),
+            'errors': sum(1 for status, _ in entries if not 200 <= status < 400),
+            'status': statuses,
+            'rps': round(len(entries) / duration, 2),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 0.50) * 1000, 2),
+                'p95': round(percentile(latencies, 0.95) * 1000, 2),
+                'p99': round(percentile(latencies, 0.99) * 1000, 2),
+                'mean': round(sum(latencies) / len(latencies) * 1000, 2),
+                'max': round(latencies[-1] * 1000, 2)
+            }
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de charge de IA Chat')
+    parser.add_argument('--configs', default='1x8,2x4',
+                        help='configurations WORKERSxTHREADS séparées par des virgules, ou "werkzeug"')
+    parser.add_argument('--scenarios', default='login,preferences,models,chat',
+                        help=f'parmi: {", ".join(SCENARIOS)}')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--models-ttl', type=int, default=2,
+                        help='durée de vie du cache des modèles pendant le test (secondes)')
+    parser.add_argument('--load-delay', type=float, default=2.0)
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--reply-tokens', type=int, default=64)
+    parser.add_argument('--output', help='fichier JSON de sortie (défaut: sortie standard)')
+    args = parser.parse_args()
+
+    stub = StubOllama(
+        load_delay=args.load_delay,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens
+    ).start()
+
+    env = {
+        'OLLAMA_HOST': stub.host,
+        'OLLAMA_PORT': str(stub.port),
+        'OLLAMA_BACKENDS': '',
+        'MODELS_CACHE_TTL': str(args.models_ttl),
+        'BENCH_USERS': str(args.concurrency)
+    }
+
+    results = []
+    try:
+        for config in args.configs.split(','):
+            with AppServer(config.strip(), env) as server:
+                for name in args.scenarios.split(','):
+                    samples = run_scenario(
+                        server.base_url, SCENARIOS[name.strip()],
+                        args.concurrency, args.duration, args.warmup
+                    )
+                    results.append({
+                        'config': config.strip(),
+                        'scenario': name.strip(),
+                        'metrics': summarize(samples, args.duration)
+                    })
+                    print(f'{config} {name}: {len(samples)} mesures', file=sys.stderr)
+    finally:
+        stub.stop()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'parameters': {
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'models_ttl': args.models_ttl,
+            'ollama': stub.params()
+        },
+        'results': results
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
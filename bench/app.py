@@ -0,0 +1,12 @@
+"""Application WSGI sur base de données factice, cible de gunicorn
+
+    gunicorn -w 2 --threads 4 bench.app:application
+"""
+
+import os
+
+from bench import stub_db
+
+stub_db.install(users=int(os.getenv('BENCH_USERS', 100)))
+
+from wsgi import application  # noqa: E402
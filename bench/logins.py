@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Débit de vérification des mots de passe selon le coût scrypt
+
+    python -m bench.logins --costs 12,14,15 --workers 1,2,4
+
+Pour chaque coût (log2 de N) et chaque taille de pool, des threads
+simulent des connexions simultanées pendant --duration secondes. Le
+résultat (connexions/s et latences) est écrit en JSON.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+from bench.report import git_commit, percentile
+from credentials import Credentials
+
+
+def measure(cost, workers, concurrency, duration):
+    creds = Credentials(n=2 ** cost, workers=workers, max_pending=concurrency)
+    stored = creds.hash_password('bench')
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def login():
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            creds.verify_password('bench', stored)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=login) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    creds.shutdown()
+
+    latencies.sort()
+    return {
+        'cost': cost,
+        'workers': workers,
+        'logins': len(latencies),
+        'logins_per_second': round(len(latencies) / duration, 2),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Débit des connexions selon le coût de hachage')
+    parser.add_argument('--costs', default='12,14,15', help='log2 du paramètre N de scrypt')
+    parser.add_argument('--workers', default='1,2,4', help='tailles du pool de processus (0: dans le thread)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    results = []
+    for cost in (int(c) for c in args.costs.split(',')):
+        for workers in (int(w) for w in args.workers.split(',')):
+            results.append(measure(cost, workers, args.concurrency, args.duration))
+            print(f'N=2^{cost} workers={workers}: {results[-1]["logins_per_second"]} connexions/s', file=sys.stderr)
+
+    print(json.dumps({
+        'commit': git_commit(),
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'results': results
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Scénarios de charge
+
+Chaque scénario est une classe dont setup() prépare un utilisateur virtuel
+(session HTTP connectée) et step() exécute une opération en renvoyant la
+liste des mesures (nom, statut HTTP, durée en secondes).
+"""
+
+import random
+import time
+
+import requests
+
+QUESTIONS = [
+    'Comment caler deux morceaux à des BPM différents ?',
+    'Quelle est la différence entre un mix harmonique et un mix à l\'oreille ?',
+    'Donne-moi trois idées de transition pour un set house.',
+    'Bonjour',
+]
+
+
+def timed(name, call):
+    start = time.perf_counter()
+    try:
+        response = call()
+        status = response.status_code
+        response.close()
+    except requests.RequestException:
+        status = 0
+    return (name, status, time.perf_counter() - start)
+
+
+class Scenario:
+    name = None
+
+    def __init__(self, base_url, user_index, password='bench'):
+        self.base_url = base_url
+        self.username = f'bench{user_index}'
+        self.password = password
+        self.session = requests.Session()
+
+    def login(self, session=None):
+        return (session or self.session).post(
+            f'{self.base_url}/api/auth/login',
+            json={'username': self.username, 'password': self.password},
+            timeout=30
+        )
+
+    def setup(self):
+        self.login().raise_for_status()
+
+    def step(self):
+        raise NotImplementedError
+
+    def close(self):
+        self.session.close()
+
+
+class LoginStorm(Scenario):
+    """Connexions successives, chacune sur une nouvelle session"""
+    name = 'login'
+
+    def setup(self):
+        pass
+
+    def step(self):
+        with requests.Session() as session:
+            return [timed('login', lambda: self.login(session))]
+
+
+class Preferences(Scenario):
+    """Lecture des préférences, avec une écriture toutes les dix lectures"""
+    name = 'preferences'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count = 0
+
+    def step(self):
+        self.count += 1
+        url = f'{self.base_url}/api/preferences'
+        if self.count % 10 == 0:
+            preferences = {
+                'model': 'phi',
+                'interests': random.sample(['house', 'techno', 'vinyle', 'mix'], 2),
+                'system_message': 'Assistant de benchmark'
+            }
+            return [timed('preferences_write', lambda: self.session.post(url, json=preferences, timeout=30))]
+        return [timed('preferences_read', lambda: self.session.get(url, timeout=30))]
+
+
+class Models(Scenario):
+    """Liste des modèles, le cache expirant pendant le test (MODELS_CACHE_TTL)"""
+    name = 'models'
+
+    def step(self):
+        return [timed('models', lambda: self.session.get(f'{self.base_url}/api/models', timeout=30))]
+
+
+class Chat(Scenario):
+    """Chat complet (non streamé) sur le modèle par défaut"""
+    name = 'chat'
+
+    def step(self):
+        payload = {'model': 'phi', 'message': random.choice(QUESTIONS)}
+        return [timed('chat', lambda: self.session.post(f'{self.base_url}/api/chat', json=payload, timeout=300))]
+
+
+class ChatStream(Scenario):
+    """Chat streamé : mesure le premier fragment et la réponse complète"""
+    name = 'chat_stream'
+
+    def step(self):
+        payload = {'model': 'phi', 'message': random.choice(QUESTIONS), 'stream': True}
+        start = time.perf_counter()
+        try:
+            with self.session.post(f'{self.base_url}/api/chat', json=payload, stream=True, timeout=300) as response:
+                first = None
+                for line in response.iter_lines():
+                    if line and first is None:
+                        first = time.perf_counter() - start
+                total = time.perf_counter() - start
+                return [
+                    ('chat_stream_first_token', response.status_code, first if first is not None else total),
+                    ('chat_stream_total', response.status_code, total)
+                ]
+        except requests.RequestException:
+            return [('chat_stream_total', 0, time.perf_counter() - start)]
+
+
+class Jobs(Scenario):
+    """Chat asynchrone : soumission du job puis attente de son résultat (long-poll)
+
+    Les jobs de la base factice restent dans le processus qui les a créés :
+    à mesurer avec un seul worker (1xT) ou werkzeug.
+    """
+    name = 'jobs'
+
+    def step(self):
+        payload = {'model': 'phi', 'message': random.choice(QUESTIONS)}
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f'{self.base_url}/api/jobs', json=payload, timeout=30)
+            submitted = time.perf_counter() - start
+            if response.status_code != 202:
+                return [('jobs_submit', response.status_code, submitted)]
+            url = f"{self.base_url}/api/jobs/{response.json()['id']}"
+            status = 'queued'
+            while status in ('queued', 'running'):
+                poll = self.session.get(url, params={'wait': 30}, timeout=60)
+                if poll.status_code != 200:
+                    break
+                status = poll.json()['status']
+            return [
+                ('jobs_submit', response.status_code, submitted),
+                ('jobs_total', poll.status_code if status == 'done' else 0, time.perf_counter() - start)
+            ]
+        except requests.RequestException:
+            return [('jobs_total', 0, time.perf_counter() - start)]
+
+
+SCENARIOS = {cls.name: cls for cls in (LoginStorm, Preferences, Models, Chat, ChatStream, Jobs)}
@@ -0,0 +1,254 @@
+"""Base de données en mémoire remplaçant MySQL pendant les benchmarks
+
+install() doit être appelé avant d'importer server : il enregistre un module
+db.database dont l'objet db expose la même interface que Database.
+"""
+
+import copy
+import itertools
+import sys
+import threading
+import time
+import types
+from datetime import datetime
+
+from credentials import credentials
+# Fonctions partagées avec les vrais backends (db.base ne crée pas de connexion)
+from db.base import USER_FIELDS, build_system_prompt, estimate_tokens
+
+DEFAULT_PREFERENCES = {
+    'language': 'fr',
+    'interests': [],
+    'model': 'phi',
+    'system_message': "Tu es Fusikab IA, un assistant qui aide les utilisateurs de manière amicale et professionnelle, spécialisé dans la musique et le DJing."
+}
+
+
+class StubDatabase:
+    def __init__(self, users=100, password='bench'):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._conversation_ids = itertools.count(1)
+        self.users = {}
+        self.conversations = {}
+        self.jobs = {}
+        self._add_user('admin', credentials.hash_password('admin'), True)
+        # Un seul hachage pour tous les comptes : la création reste rapide
+        hashed = credentials.hash_password(password)
+        for i in range(users):
+            self._add_user(f'bench{i}', hashed)
+
+    def init_db(self):
+        pass
+
+    def invalidate_preferences(self, user_id=None):
+        pass
+
+    def verify_user(self, username, password):
+        with self._lock:
+            user = next((u for u in self.users.values() if u['username'] == username), None)
+        stored = user['password'] if user else credentials.dummy_hash()
+        if credentials.verify_password(password, stored) and user:
+            return (user['id'], user['is_admin'])
+        return None
+
+    def get_users(self, limit=50, cursor=None, search=None, fields=None):
+        fields = [f for f in USER_FIELDS if not fields or f in fields or f == 'id']
+        offset = int(cursor or 0)
+        with self._lock:
+            if search:
+                users = sorted((u for u in self.users.values()
+                                if u['username'].lower().startswith(search.lower())),
+                               key=lambda u: (u['username'].lower(), u['id']))
+            else:
+                users = sorted(self.users.values(), key=lambda u: (u['created_at'], u['id']), reverse=True)
+            page = users[offset:offset + limit]
+            total = None if search else len(self.users)
+        next_cursor = str(offset + limit) if len(users) > offset + limit else None
+        return [
+            {field: user['created_at'].isoformat() if field == 'created_at' else user[field] for field in fields}
+            for user in page
+        ], next_cursor, total
+
+    def get_default_preferences(self):
+        return DEFAULT_PREFERENCES
+
+    def get_user_preferences(self, user_id):
+        with self._lock:
+            user = self.users.get(user_id)
+            return user['preferences'] if user and user['preferences'] else DEFAULT_PREFERENCES
+
+    def get_system_prompt(self, user_id):
+        return build_system_prompt(self.get_user_preferences(user_id))
+
+    def update_preferences(self, user_id, preferences):
+        with self._lock:
+            if user_id not in self.users:
+                return False
+            self.users[user_id]['preferences'] = copy.deepcopy(preferences)
+            return True
+
+    def create_user(self, username, password, is_admin=False, preferences=None):
+        return self._add_user(username, credentials.hash_password(password), is_admin, preferences)
+
+    def _add_user(self, username, hashed, is_admin=False, preferences=None):
+        with self._lock:
+            if any(user['username'] == username for user in self.users.values()):
+                return None
+            user_id = next(self._ids)
+            self.users[user_id] = {
+                'id': user_id,
+                'username': username,
+                'password': hashed,
+                'is_admin': is_admin,
+                'quota': None,
+                'preferences': copy.deepcopy(preferences or DEFAULT_PREFERENCES),
+                'created_at': datetime.now()
+            }
+            return user_id
+
+    def update_user(self, user_id, username, password, is_admin):
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None:
+                return False
+            user.update(username=username, is_admin=is_admin)
+            if password:
+                user['password'] = credentials.hash_password(password)
+            return True
+
+    def delete_user(self, user_id):
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None or user['username'] == 'admin':
+                return False
+            del self.users[user_id]
+            return True
+
+    def get_popular_models(self, limit=3):
+        return ['phi'][:limit]
+
+    def create_conversation(self, user_id, title=None):
+        with self._lock:
+            conversation_id = next(self._conversation_ids)
+            self.conversations[conversation_id] = {'user_id': user_id, 'messages': []}
+            return conversation_id
+
+    def discard_conversation(self, conversation_id):
+        with self._lock:
+            conversation = self.conversations.get(conversation_id)
+            if conversation is None or conversation['messages']:
+                return False
+            del self.conversations[conversation_id]
+            return True
+
+    def get_context_messages(self, conversation_id, user_id, token_budget, limit=50):
+        with self._lock:
+            conversation = self.conversations.get(conversation_id)
+            if conversation is None or conversation['user_id'] != user_id:
+                return None
+            rows = conversation['messages'][-limit:]
+
+        context = []
+        used = 0
+        for message in reversed(rows):
+            used += estimate_tokens(message['content'])
+            if used > token_budget:
+                break
+            context.append(message)
+        context.reverse()
+        while context and context[0]['role'] != 'user':
+            context.pop(0)
+        return context
+
+    def append_messages(self, conversation_id, messages):
+        with self._lock:
+            conversation = self.conversations.get(conversation_id)
+            if conversation is None:
+                return False
+            conversation['messages'].extend(dict(m) for m in messages)
+            return True
+
+    # Jobs : mêmes transitions d'état que la table chat_jobs, propres au processus
+    # (avec plusieurs workers gunicorn, un job n'est visible que de son worker)
+    def create_job(self, job_id, user_id, model, request, conversation_id=None):
+        now = time.time()
+        with self._lock:
+            self.jobs[job_id] = {
+                'id': job_id, 'user_id': user_id, 'conversation_id': conversation_id, 'model': model,
+                'status': 'queued', 'request': copy.deepcopy(request), 'result': None, 'error': None,
+                'created_at': now, 'updated_at': now
+            }
+
+    def get_job(self, job_id, user_id=None):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or (user_id is not None and job['user_id'] != user_id):
+                return None
+            return copy.deepcopy(job)
+
+    def queued_jobs(self, limit=10):
+        with self._lock:
+            queued = sorted((j for j in self.jobs.values() if j['status'] == 'queued'),
+                            key=lambda j: j['created_at'])
+            return [job['id'] for job in queued[:limit]]
+
+    def _update_job(self, job_id, statuses, user_id=None, **changes):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['status'] not in statuses or (user_id is not None and job['user_id'] != user_id):
+                return False
+            job.update(changes, updated_at=time.time())
+            return True
+
+    def claim_job(self, job_id):
+        return self._update_job(job_id, ('queued',), status='running')
+
+    def touch_job(self, job_id):
+        return self._update_job(job_id, ('running',))
+
+    def finish_job(self, job_id, status, result=None, error=None):
+        return self._update_job(job_id, ('running',), status=status, result=copy.deepcopy(result),
+                                error=error[:255] if error else None)
+
+    def requeue_job(self, job_id):
+        return self._update_job(job_id, ('running',), status='queued')
+
+    def cancel_job(self, job_id, user_id):
+        return self._update_job(job_id, ('queued', 'running'), user_id=user_id, status='cancelled')
+
+    def expire_jobs(self, finished_before, stale_before):
+        deleted = requeued = 0
+        with self._lock:
+            for job_id, job in list(self.jobs.items()):
+                if job['status'] in ('done', 'failed', 'cancelled') and job['updated_at'] < finished_before:
+                    del self.jobs[job_id]
+                    deleted += 1
+                elif job['status'] == 'running' and job['updated_at'] < stale_before:
+                    job.update(status='queued', updated_at=time.time())
+                    requeued += 1
+        return deleted, requeued
+
+    def get_user_quota(self, user_id):
+        user = self.users.get(user_id)
+        return user['quota'] if user else None
+
+    def set_user_quota(self, user_id, quota):
+        with self._lock:
+            if user_id in self.users:
+                self.users[user_id]['quota'] = quota
+
+    # Les quotas ne limitent pas la charge mesurée : seaux toujours pleins
+    def take_quota(self, user_id, bucket, capacity, rate, cost=1, minimum=None, force=False):
+        return True, capacity
+
+
+def install(users=100, password='bench'):
+    """Enregistre un module db.database factice et renvoie son objet db"""
+    module = types.ModuleType('db.database')
+    module.db = StubDatabase(users=users, password=password)
+    module.Database = StubDatabase
+    module.build_system_prompt = build_system_prompt
+    module.estimate_tokens = estimate_tokens
+    sys.modules['db.database'] = module
+    return module.db
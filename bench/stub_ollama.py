@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""Serveur Ollama factice pour les benchmarks
+
+Imite /api/chat (complet ou en flux), /api/embed, /api/tags, /api/ps et
+/api/show avec un temps de chargement des modèles et un débit de génération
+configurables. Les embeddings sont des sacs de mots hachés : des textes
+proches ont des vecteurs proches, ce qui suffit à exercer la recherche
+(python3 retrieval.py ingest avec OLLAMA_PORT pointant sur ce serveur).
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubOllama:
+    def __init__(self, host='127.0.0.1', port=0, models=('phi', 'llama3'),
+                 load_delay=2.0, tokens_per_second=50.0, reply_tokens=64,
+                 prompt_eval_delay=0.05, keep_alive=300, embed_dim=256, embed_delay=0.005):
+        self.models = list(models)
+        self.load_delay = load_delay
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.prompt_eval_delay = prompt_eval_delay
+        self.keep_alive = keep_alive
+        self.embed_dim = embed_dim
+        # Durée par texte vectorisé
+        self.embed_delay = embed_delay
+
+        self._lock = threading.Lock()
+        self._loaded = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-ollama', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def params(self):
+        return {
+            'models': self.models,
+            'load_delay': self.load_delay,
+            'tokens_per_second': self.tokens_per_second,
+            'reply_tokens': self.reply_tokens,
+            'prompt_eval_delay': self.prompt_eval_delay,
+            'embed_dim': self.embed_dim,
+            'embed_delay': self.embed_delay
+        }
+
+    # Simulation
+
+    def _ensure_loaded(self, model):
+        """Simule le chargement d'un modèle froid, renvoie la durée en ns"""
+        now = time.monotonic()
+        with self._lock:
+            expires = self._loaded.get(model)
+            cold = expires is None or expires < now
+        if cold:
+            time.sleep(self.load_delay)
+        with self._lock:
+            self._loaded[model] = time.monotonic() + self.keep_alive
+        return int(self.load_delay * 1e9) if cold else 0
+
+    def _embedding(self, text):
+        """Vecteur normalisé : chaque mot incrémente une composante choisie par hachage"""
+        vector = [0.0] * self.embed_dim
+        for word in re.findall(r'\w+', text.lower()):
+            digest = hashlib.md5(word.encode('utf-8')).digest()
+            vector[int.from_bytes(digest[:4], 'little') % self.embed_dim] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _loaded_models(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (model, expires - now) for model, expires in self._loaded.items() if expires > now
+            ]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, payload):
+                data = json.dumps(payload).encode('utf-8') + b'\n'
+                self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+                self.wfile.flush()
+
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length', 0))
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def do_GET(self):
+                if self.path == '/api/tags':
+                    self._send_json({'models': [
+                        {'name': f'{name}:latest', 'size': 2 * 1024 ** 3} for name in stub.models
+                    ]})
+                elif self.path == '/api/ps':
+                    now = datetime.now(timezone.utc)
+                    self._send_json({'models': [
+                        {
+                            'name': f'{name}:latest',
+                            'size_vram': 2 * 1024 ** 3,
+                            'expires_at': (now + timedelta(seconds=remaining)).isoformat()
+                        }
+                        for name, remaining in stub._loaded_models()
+                    ]})
+                else:
+                    self._send_json({'error': 'not found'}, 404)
+
+            def do_POST(self):
+                payload = self._read_json()
+                if self.path == '/api/show':
+                    self._send_json({
+                        'details': {'parameter_size': '2.7B', 'quantization_level': 'Q4_0'},
+                        'model_info': {'general.context_length': 2048}
+                    })
+                elif self.path == '/api/chat':
+                    self._chat(payload)
+                elif self.path == '/api/embed':
+                    self._embed(payload)
+                else:
+                    self._send_json({'error': 'not found'}, 404)
+
+            def _embed(self, payload):
+                # Tout nom de modèle est accepté : les modèles d'embedding ne sont pas listés
+                inputs = payload.get('input') or []
+                if isinstance(inputs, str):
+                    inputs = [inputs]
+                model = payload.get('model', '')
+                load_duration = stub._ensure_loaded(model)
+                time.sleep(stub.embed_delay * len(inputs))
+                self._send_json({
+                    'model': model,
+                    'embeddings': [stub._embedding(text) for text in inputs],
+                    'load_duration': load_duration,
+                    'total_duration': load_duration + int(stub.embed_delay * len(inputs) * 1e9)
+                })
+
+            def _chat(self, payload):
+                model = payload.get('model', '').replace(':latest', '')
+                if model not in stub.models:
+                    self._send_json({'error': f"model '{model}' not found"}, 404)
+                    return
+
+                load_duration = stub._ensure_loaded(model)
+                messages = payload.get('messages') or []
+                if not messages:
+                    # Requête de préchargement
+                    self._send_json({'model': model, 'done': True, 'load_duration': load_duration})
+                    return
+
+                time.sleep(stub.prompt_eval_delay)
+                delay = 1.0 / stub.tokens_per_second
+                final = {
+                    'model': model,
+                    'done': True,
+                    'load_duration': load_duration,
+                    'prompt_eval_count': sum(len(m.get('content', '')) // 4 + 1 for m in messages),
+                    'prompt_eval_duration': int(stub.prompt_eval_delay * 1e9),
+                    'eval_count': stub.reply_tokens,
+                    'eval_duration': int(stub.reply_tokens * delay * 1e9)
+                }
+                final['total_duration'] = load_duration + final['prompt_eval_duration'] + final['eval_duration']
+
+                if payload.get('stream', True):
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/x-ndjson')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    for i in range(stub.reply_tokens):
+                        time.sleep(delay)
+                        self._write_chunk({
+                            'model': model,
+                            'done': False,
+                            'message': {'role': 'assistant', 'content': f'mot{i} '}
+                        })
+                    self._write_chunk({**final, 'message': {'role': 'assistant', 'content': ''}})
+                    self.wfile.write(b'0\r\n\r\n')
+                else:
+                    time.sleep(stub.reply_tokens * delay)
+                    content = ''.join(f'mot{i} ' for i in range(stub.reply_tokens))
+                    self._send_json({**final, 'message': {'role': 'assistant', 'content': content}})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serveur Ollama factice')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--models', default='phi,llama3')
+    parser.add_argument('--load-delay', type=float, default=2.0)
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--reply-tokens', type=int, default=64)
+    args = parser.parse_args()
+
+    stub = StubOllama(
+        host=args.host,
+        port=args.port,
+        models=args.models.split(','),
+        load_delay=args.load_delay,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens
+    )
+    print(f'Ollama factice sur http://{stub.host}:{stub.port}')
+    stub.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Construit les fichiers statiques servis en production
+
+Chaque feuille de style et script reçoit un nom contenant l'empreinte de
+son contenu (chat.879aba1464dc.js), une version gzip et, si le module brotli
+est installé, une version brotli. Les pages HTML sont réécrites pour
+pointer vers ces noms, et dist/manifest.json décrit le résultat.
+
+    python3 build_assets.py
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DIST = os.path.join(ROOT, 'dist')
+
+PAGES = ['index.html', 'login.html', 'chat.html', 'admin.html']
+ASSETS = ['chat.js', 'chat.css', 'admin.js', 'admin.css', 'script.js', 'style.css']
+
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def write_variants(name, data):
+    """Écrit le fichier et ses variantes compressées, renvoie les encodages créés"""
+    with open(os.path.join(DIST, name), 'wb') as f:
+        f.write(data)
+
+    encodings = []
+    with open(os.path.join(DIST, name + '.gz'), 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    encodings.append('gzip')
+
+    if brotli is not None:
+        with open(os.path.join(DIST, name + '.br'), 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+        encodings.append('br')
+    return encodings
+
+
+def rewrite_references(html, mapping):
+    # Remplace href="chat.css" / src="chat.js" par les noms avec empreinte
+    def replace(match):
+        attribute, quote, path = match.groups()
+        return f'{attribute}={quote}{mapping.get(path, path)}{quote}'
+    return re.sub(r'(href|src)=(["\'])/?([\w.-]+)\2', replace, html)
+
+
+def build():
+    if os.path.isdir(DIST):
+        shutil.rmtree(DIST)
+    os.makedirs(DIST)
+
+    manifest = {'assets': {}, 'pages': {}}
+    mapping = {}
+
+    for name in ASSETS:
+        with open(os.path.join(ROOT, name), 'rb') as f:
+            data = f.read()
+        digest = fingerprint(data)
+        base, ext = os.path.splitext(name)
+        hashed = f'{base}.{digest}{ext}'
+        mapping[name] = f'/{hashed}'
+        manifest['assets'][hashed] = {
+            'source': name,
+            'etag': digest,
+            'encodings': write_variants(hashed, data)
+        }
+
+    for name in PAGES:
+        with open(os.path.join(ROOT, name), 'r', encoding='utf-8') as f:
+            data = rewrite_references(f.read(), mapping).encode('utf-8')
+        manifest['pages'][name] = {
+            'etag': fingerprint(data),
+            'encodings': write_variants(name, data)
+        }
+
+    with open(os.path.join(DIST, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == '__main__':
+    manifest = build()
+    print(f"{len(manifest['assets'])} fichiers et {len(manifest['pages'])} pages dans {DIST}")
+    if brotli is None:
+        print("Note: module brotli absent, seules les versions gzip ont été créées")
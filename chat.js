@@ -24,6 +24,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
     tooltipTriggerList.map(tooltipTriggerEl => new bootstrap.Tooltip(tooltipTriggerEl));
 
+    // Conversation en cours (historique conservé côté serveur)
+    let conversationId = null;
+
     // Current preferences state
     let currentPreferences = {
         model: '',
@@ -124,21 +127,18 @@ document.addEventListener('DOMContentLoaded', () => {
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     model: selectedModel,
-                    messages: [{ role: 'user', content: message }],
-                    preferences: currentPreferences
+                    message: message,
+                    conversation_id: conversationId,
+                    stream: true
                 })
             });
 
-            // Supprimer l'indicateur de chargement
-            const loadingElement = messagesContainer.querySelector('.loading')?.parentElement;
-            if (loadingElement) {
-                loadingElement.remove();
+            if (!response.ok) {
+                removeLoadingIndicator();
+                throw new Error('Erreur réseau');
             }
 
-            if (!response.ok) throw new Error('Erreur réseau');
-
-            const data = await response.json();
-            addMessage(data.message.content, false);
+            await readChatStream(response);
 
         } catch (error) {
             console.error('Erreur:', error);
@@ -148,6 +148,64 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Affiche les fragments NDJSON au fur et à mesure de leur arrivée
+    async function readChatStream(response) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let messageParts = null;
+
+        const handleLine = (line) => {
+            if (!line.trim()) return;
+            const chunk = JSON.parse(line);
+
+            if (chunk.error) throw new Error(chunk.error);
+
+            if (!messageParts) {
+                removeLoadingIndicator();
+                messageParts = addMessage('', false);
+            }
+
+            if (chunk.done) {
+                if (chunk.conversation_id) conversationId = chunk.conversation_id;
+                const details = [];
+                // Mode auto : modèle choisi par le serveur
+                if (modelSelect.value === 'auto' && chunk.model) details.push(chunk.model);
+                if (chunk.eval_count && chunk.eval_duration) {
+                    const tokensPerSecond = chunk.eval_count / (chunk.eval_duration / 1e9);
+                    details.push(`${chunk.eval_count} tokens · ${tokensPerSecond.toFixed(1)} tokens/s`);
+                }
+                messageParts.time.title = details.join(' · ');
+                return;
+            }
+
+            messageParts.content.textContent += chunk.message.content;
+            scrollToBottom();
+        };
+
+        try {
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.forEach(handleLine);
+            }
+            handleLine(buffer);
+        } finally {
+            removeLoadingIndicator();
+        }
+    }
+
+    function removeLoadingIndicator() {
+        const loadingElement = messagesContainer.querySelector('.loading')?.parentElement;
+        if (loadingElement) {
+            loadingElement.remove();
+        }
+    }
+
     function handleInput() {
         updateCharCounter();
         adjustTextareaHeight();
@@ -286,19 +344,28 @@ document.addEventListener('DOMContentLoaded', () => {
     async function loadModels() {
         try {
             const response = await fetch('/api/models');
+            if (response.status === 503) {
+                // Liste pas encore disponible côté serveur : nouvel essai
+                const delay = parseInt(response.headers.get('Retry-After') || '2', 10);
+                setTimeout(loadModels, delay * 1000);
+                return;
+            }
             const models = await response.json();
 
             const modelsHtml = models.map(model => `
-                <option value="${model.name}">${model.name} (${model.size})</option>
+                <option value="${model.name}" title="${modelDetails(model)}">${model.name} (${model.parameter_size || model.size})${model.loaded ? ' • chargé' : ''}</option>
             `).join('');
 
             // Update both selects
+            const autoOption = '<option value="auto">Automatique (selon la question)</option>';
             modelSelect.innerHTML = `
                 <option value="" disabled selected>Sélectionner un modèle</option>
+                ${autoOption}
                 ${modelsHtml}
             `;
             defaultModelSelect.innerHTML = `
                 <option value="">Aucun modèle par défaut</option>
+                ${autoOption}
                 ${modelsHtml}
             `;
         } catch (error) {
@@ -307,6 +374,14 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    function modelDetails(model) {
+        return [
+            model.size,
+            model.quantization,
+            model.context_length ? `contexte ${model.context_length} tokens` : null
+        ].filter(Boolean).join(' • ');
+    }
+
     function addMessage(content, isUser) {
         const messageElement = messageTemplate.content.cloneNode(true);
         const messageDiv = messageElement.querySelector('.message');
@@ -322,6 +397,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
         messagesContainer.appendChild(messageElement);
         scrollToBottom();
+
+        return { content: contentDiv, time: timeDiv };
     }
 
     function setFormState(disabled) {
@@ -0,0 +1,61 @@
+import os
+import gzip
+from flask import request
+from dotenv import load_dotenv
+
+from timing import span
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Load environment variables
+load_dotenv()
+
+
+class ResponseCompressor:
+    """Compression gzip ou brotli des réponses JSON, selon Accept-Encoding
+
+    Les flux (chat en streaming, lots) ne sont pas compressés : chaque ligne
+    doit partir dès qu'elle est prête. Les niveaux sont modérés, le coût CPU
+    se paie à chaque réponse contrairement aux fichiers statiques.
+    """
+
+    def __init__(self, min_size=None, gzip_level=None, brotli_quality=None, mimetypes=None):
+        self.min_size = int(min_size or os.getenv('COMPRESS_MIN_SIZE', 1024))
+        self.gzip_level = int(gzip_level or os.getenv('COMPRESS_GZIP_LEVEL', 6))
+        self.brotli_quality = int(brotli_quality or os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+        self.mimetypes = set(mimetypes or os.getenv('COMPRESS_MIMETYPES', 'application/json').split(','))
+
+    def _choose_encoding(self):
+        if brotli is not None and request.accept_encodings['br']:
+            return 'br'
+        if request.accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, response):
+        if response.mimetype not in self.mimetypes or response.is_streamed or response.direct_passthrough:
+            return response
+        if 'Content-Encoding' in response.headers or response.status_code in (204, 304):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        data = response.get_data()
+        encoding = self._choose_encoding()
+        if encoding is None or len(data) < self.min_size:
+            return response
+
+        with span('compress'):
+            if encoding == 'br':
+                data = brotli.compress(data, quality=self.brotli_quality)
+            else:
+                data = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+# Compression partagée par toutes les routes
+response_compressor = ResponseCompressor()
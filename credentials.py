@@ -0,0 +1,130 @@
+import os
+import hmac
+import base64
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+PREFIX = 'scrypt'
+
+
+class CredentialsBusy(Exception):
+    """Trop de vérifications de mot de passe en attente"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(
+        password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+        maxmem=128 * n * r * p + 1024 * 1024, dklen=32
+    )
+
+
+def _hash(password, n, r, p):
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, n, r, p)
+    return f'{PREFIX}${n}${r}${p}${_b64encode(salt)}${_b64encode(digest)}'
+
+
+def _verify(password, stored):
+    if not is_hashed(stored):
+        # Ancien mot de passe en clair, migré après la connexion
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    _, n, r, p, salt, digest = stored.split('$')
+    computed = _scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(computed, _b64decode(digest))
+
+
+def is_hashed(stored):
+    return stored.startswith(PREFIX + '$')
+
+
+class Credentials:
+    """Hachage scrypt salé des mots de passe, calculé hors des threads web
+
+    Les calculs partent dans un pool de processus borné : une vague de
+    connexions n'occupe ni le GIL ni les threads qui servent le chat.
+    """
+
+    def __init__(self, n=None, r=None, p=None, workers=None, max_pending=None, timeout=None):
+        self.n = int(n or os.getenv('CREDENTIALS_SCRYPT_N', 2 ** 14))
+        self.r = int(r or os.getenv('CREDENTIALS_SCRYPT_R', 8))
+        self.p = int(p or os.getenv('CREDENTIALS_SCRYPT_P', 1))
+        self.workers = int(workers if workers is not None else os.getenv('CREDENTIALS_WORKERS', 2))
+        self.timeout = float(timeout or os.getenv('CREDENTIALS_TIMEOUT', 10))
+        max_pending = int(max_pending or os.getenv('CREDENTIALS_MAX_PENDING', 64))
+
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._dummy = None
+
+    def _get_executor(self):
+        # Créé au premier usage, donc après le fork des workers gunicorn
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._pending.acquire(timeout=self.timeout):
+            raise CredentialsBusy('Trop de connexions en cours')
+        try:
+            return self._get_executor().submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Processus de hachage saturés : même réponse qu'une file pleine
+            raise CredentialsBusy('Hachage trop lent, réessayez') from None
+        finally:
+            self._pending.release()
+
+    def hash_password(self, password):
+        return self._run(_hash, password, self.n, self.r, self.p)
+
+    def verify_password(self, password, stored):
+        return self._run(_verify, password, stored)
+
+    def dummy_hash(self):
+        """Hachage d'un mot de passe aléatoire, vérifié pour les utilisateurs inconnus
+
+        Même coût qu'un vrai compte : la durée de réponse ne révèle pas
+        quels noms d'utilisateur existent.
+        """
+        if self._dummy is None:
+            dummy = self.hash_password(_b64encode(os.urandom(16)))
+            with self._lock:
+                self._dummy = self._dummy or dummy
+        return self._dummy
+
+    def needs_rehash(self, stored):
+        """Mot de passe en clair ou haché avec d'autres paramètres de coût"""
+        if not is_hashed(stored):
+            return True
+        _, n, r, p, _, _ = stored.split('$')
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Instance partagée par la base de données
+credentials = Credentials()
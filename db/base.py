@@ -0,0 +1,730 @@
+import os
+import tempfile
+import threading
+import json
+import base64
+import time
+from contextlib import contextmanager
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+from credentials import credentials
+from timing import span
+from db.migrations import CREATE_TABLE, load_migrations, split_statements
+
+# Load environment variables
+load_dotenv()
+
+class Database:
+    """Storage interface shared by the MySQL and SQLite backends
+
+    Backends provide get_connection() (a connection exposing the
+    mysql.connector cursor API with %s placeholders) and the name of their
+    migrations directory. No connection is opened before the first query.
+    """
+
+    # Répertoire des migrations dans db/schema/
+    schema = None
+
+    # Exceptions levées par le pilote du backend
+    Error = Exception
+    IntegrityError = Exception
+
+    # Expression SQL extrayant une valeur texte d'une colonne JSON
+    json_text = "JSON_UNQUOTE(JSON_EXTRACT({column}, '{path}'))"
+
+    # Plus petite de deux valeurs (fonction scalaire)
+    least = 'LEAST'
+
+    # Colonne de recherche, dans la collation de son index
+    username_key = 'username'
+
+    # Nombre approximatif d'utilisateurs, sans parcourir la table
+    user_count_estimate = (
+        "SELECT TABLE_ROWS FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users'"
+    )
+
+    def __init__(self):
+        # Cache des préférences par utilisateur : (préférences, message système)
+        self._prefs_cache = TTLCache(
+            maxsize=int(os.getenv('PREFS_CACHE_SIZE', 10000)),
+            ttl=int(os.getenv('PREFS_CACHE_TTL', 300))
+        )
+        self._default_prefs = None
+        self._cache_lock = threading.Lock()
+        # Tampon de version partagé entre les workers gunicorn d'une même machine
+        self._cache_stamp_path = os.getenv(
+            'PREFS_CACHE_STAMP',
+            os.path.join(tempfile.gettempdir(), 'ia-chat-prefs.version')
+        )
+        self._cache_stamp = self._read_cache_stamp()
+
+    def init_db(self):
+        """Apply pending schema migrations, return the versions applied"""
+        migrations = load_migrations(self.schema)
+        if not migrations:
+            return []
+
+        conn = self.get_connection()
+        try:
+            # Cas courant : schéma à jour, une seule requête
+            if self._schema_version(conn) >= migrations[-1].version:
+                return []
+
+            applied = []
+            with self._schema_lock(conn):
+                with conn.cursor() as cursor:
+                    cursor.execute(CREATE_TABLE)
+                # Relu sous le verrou : un autre processus a pu migrer entre-temps
+                current = self._schema_version(conn)
+                for migration in migrations:
+                    if migration.version <= current:
+                        continue
+                    with conn.cursor() as cursor:
+                        for statement in split_statements(migration.read()):
+                            cursor.execute(statement)
+                        cursor.execute(
+                            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                            (migration.version, migration.name)
+                        )
+                    applied.append(migration.version)
+                conn.commit()
+
+            if applied:
+                self.invalidate_preferences()
+            return applied
+        except self.Error as e:
+            print(f"Erreur lors de la migration du schéma: {e}")
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _schema_version(self, conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT MAX(version) FROM schema_migrations")
+                row = cursor.fetchone()
+            return row[0] or 0
+        except self.Error:
+            # Table absente : base jamais migrée
+            conn.rollback()
+            return 0
+
+    @contextmanager
+    def _schema_lock(self, conn):
+        """Serialize migrations between processes sharing the database"""
+        yield
+
+    def get_connection(self):
+        """Get a database connection"""
+        raise NotImplementedError
+
+    def pool_stats(self):
+        """Connection pool statistics, when the backend has a pool"""
+        return None
+
+    def open_pool(self):
+        """Open this process's connections ahead of the first request"""
+
+    def close_pool(self):
+        """Close this process's idle connections (before fork, at worker exit)"""
+
+    def _read_cache_stamp(self):
+        try:
+            stat = os.stat(self._cache_stamp_path)
+            return (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _bump_cache_stamp(self):
+        """Signal the other workers that their preference caches are stale"""
+        # Invalidations des autres workers appliquées avant d'écraser le tampon
+        # enregistré, sinon elles seraient perdues
+        self._check_cache_stamp()
+        directory = os.path.dirname(self._cache_stamp_path) or '.'
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.prefs-version-')
+            os.close(fd)
+            # Le remplacement atomique crée un nouvel inode : le tampon change toujours
+            os.replace(tmp_path, self._cache_stamp_path)
+        except OSError:
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        self._cache_stamp = self._read_cache_stamp()
+
+    def _check_cache_stamp(self):
+        """Drop cached preferences if another worker wrote since the last check"""
+        stamp = self._read_cache_stamp()
+        if stamp != self._cache_stamp:
+            with self._cache_lock:
+                self._prefs_cache.clear()
+                self._default_prefs = None
+                self._cache_stamp = stamp
+
+    def invalidate_preferences(self, user_id=None):
+        """Invalidate cached preferences for one user, or all of them"""
+        with self._cache_lock:
+            if user_id is None:
+                self._prefs_cache.clear()
+                self._default_prefs = None
+            else:
+                self._prefs_cache.pop(user_id, None)
+        self._bump_cache_stamp()
+
+    def verify_user(self, username, password):
+        """Verify user credentials, returning (id, is_admin) or None"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'SELECT id, is_admin, password FROM users WHERE username = %s',
+                    (username,)
+                )
+                result = cursor.fetchone()
+        finally:
+            conn.close()
+
+        # Le hachage est vérifié après avoir rendu la connexion au pool, même
+        # pour un nom inconnu (hachage factice) : durée identique dans les deux cas
+        stored = result[2] if result else credentials.dummy_hash()
+        if not credentials.verify_password(password, stored) or not result:
+            return None
+
+        user_id, is_admin, stored = result
+        if credentials.needs_rehash(stored):
+            self._rehash_password(user_id, stored, password)
+        return (user_id, is_admin)
+
+    def _rehash_password(self, user_id, stored, password):
+        """Migrate a plaintext (or outdated) password to the current hash"""
+        hashed = credentials.hash_password(password)
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'UPDATE users SET password = %s WHERE id = %s AND password = %s',
+                    (hashed, user_id, stored)
+                )
+            conn.commit()
+        except self.Error:
+            conn.rollback()
+        finally:
+            conn.close()
+
+    def get_users(self, limit=50, cursor=None, search=None, fields=None):
+        """Get one page of users, newest first or by username when searching
+
+        Returns (users, next_cursor, total); total is an estimate and is
+        None for searches.
+        """
+        fields = [f for f in USER_FIELDS if not fields or f in fields or f == 'id']
+        position = decode_cursor(cursor)
+
+        # Pagination par clé : (created_at, id) sur idx_created_at, ou
+        # username sur son index unique pour les recherches par préfixe
+        where, params = [], []
+        if search:
+            key = self.username_key
+            where.append(f"{key} LIKE %s ESCAPE '!'")
+            params.append(escape_like(search) + '%')
+            if position:
+                where.append(f'({key} > %s OR ({key} = %s AND id > %s))')
+                params += [position[0], position[0], position[1]]
+            order = f'{key} ASC, id ASC'
+        else:
+            if position:
+                # Borne simple en tête pour un parcours de plage sur l'index
+                where.append('created_at <= %s AND (created_at < %s OR id < %s)')
+                params += [position[0], position[0], position[1]]
+            order = 'created_at DESC, id DESC'
+
+        sql = f"SELECT {', '.join(USER_FIELDS)} FROM users"
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += f' ORDER BY {order} LIMIT %s'
+        params.append(limit + 1)
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+
+            total = None
+            if not search:
+                with conn.cursor() as cur:
+                    cur.execute(self.user_count_estimate)
+                    row = cur.fetchone()
+                    total = int(row[0] or 0) if row else 0
+        finally:
+            conn.close()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(
+                [last['username'] if search else str(last['created_at']), last['id']])
+
+        users = []
+        for row in rows:
+            created_at = row['created_at']
+            row['created_at'] = created_at.isoformat() if hasattr(created_at, 'isoformat') else created_at
+            row['is_admin'] = bool(row['is_admin'])
+            users.append({field: row[field] for field in fields})
+        return users, next_cursor, total
+
+    def get_default_preferences(self):
+        """Get default preferences (cached)"""
+        self._check_cache_stamp()
+        defaults = self._default_prefs
+        if defaults is not None:
+            return defaults
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor(dictionary=True) as cursor:
+                cursor.execute('SELECT preferences FROM default_preferences WHERE id = 1')
+                result = cursor.fetchone()
+                defaults = json.loads(result['preferences']) if result else {}
+        finally:
+            conn.close()
+
+        self._default_prefs = defaults
+        return defaults
+
+    def _get_cached_preferences(self, user_id):
+        self._check_cache_stamp()
+        with self._cache_lock:
+            entry = self._prefs_cache.get(user_id)
+        if entry is not None:
+            return entry
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor(dictionary=True) as cursor:
+                cursor.execute('SELECT preferences FROM users WHERE id = %s', (user_id,))
+                result = cursor.fetchone()
+        finally:
+            conn.close()
+
+        with span('db.prefs_parse'):
+            preferences = json.loads(result['preferences']) if result and result['preferences'] else self.get_default_preferences()
+            entry = (preferences, build_system_prompt(preferences))
+        with self._cache_lock:
+            self._prefs_cache[user_id] = entry
+        return entry
+
+    def get_user_preferences(self, user_id):
+        """Get user preferences (cached, shared: do not mutate the result)"""
+        return self._get_cached_preferences(user_id)[0]
+
+    def get_system_prompt(self, user_id):
+        """Get the system message built from the user preferences (cached)"""
+        return self._get_cached_preferences(user_id)[1]
+
+    def update_preferences(self, user_id, preferences):
+        """Update user preferences"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'UPDATE users SET preferences = %s WHERE id = %s',
+                    (json.dumps(preferences), user_id)
+                )
+            conn.commit()
+            self.invalidate_preferences(user_id)
+            return True
+        except self.Error:
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
+    def create_user(self, username, password, is_admin=False, preferences=None):
+        """Create a new user and return its id (None if the name is taken)"""
+        if preferences is None:
+            preferences = self.get_default_preferences()
+        hashed = credentials.hash_password(password)
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'INSERT INTO users (username, password, is_admin, preferences) VALUES (%s, %s, %s, %s)',
+                    (username, hashed, is_admin, json.dumps(preferences))
+                )
+                user_id = cursor.lastrowid
+            conn.commit()
+            return user_id
+        except self.IntegrityError:
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+
+    def update_user(self, user_id, username, password, is_admin):
+        """Update a user"""
+        hashed = credentials.hash_password(password) if password else None
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                if hashed:
+                    cursor.execute(
+                        'UPDATE users SET username = %s, password = %s, is_admin = %s WHERE id = %s',
+                        (username, hashed, is_admin, user_id)
+                    )
+                else:
+                    cursor.execute(
+                        'UPDATE users SET username = %s, is_admin = %s WHERE id = %s',
+                        (username, is_admin, user_id)
+                    )
+            conn.commit()
+            self.invalidate_preferences(user_id)
+            return cursor.rowcount > 0
+        except self.IntegrityError:
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
+    def delete_user(self, user_id):
+        """Delete a user"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM users WHERE id = %s AND username != %s',
+                    (user_id, 'admin')
+                )
+            conn.commit()
+            self.invalidate_preferences(user_id)
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def get_popular_models(self, limit=3):
+        """Get the models most often chosen in user preferences"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {self.json_text.format(column='preferences', path='$.model')} AS model, COUNT(*) AS users "
+                    "FROM users WHERE preferences IS NOT NULL "
+                    "GROUP BY model HAVING model IS NOT NULL AND model != '' "
+                    "ORDER BY users DESC LIMIT %s",
+                    (limit,)
+                )
+                return [row[0] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def create_conversation(self, user_id, title=None):
+        """Create a conversation and return its id"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'INSERT INTO conversations (user_id, title) VALUES (%s, %s)',
+                    (user_id, title[:100] if title else None)
+                )
+                conversation_id = cursor.lastrowid
+            conn.commit()
+            return conversation_id
+        finally:
+            conn.close()
+
+    def discard_conversation(self, conversation_id):
+        """Delete a conversation that never got a message (failed first turn)"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM conversations WHERE id = %s '
+                    'AND NOT EXISTS (SELECT 1 FROM messages WHERE conversation_id = %s)',
+                    (conversation_id, conversation_id)
+                )
+                deleted = cursor.rowcount
+            conn.commit()
+            return deleted == 1
+        finally:
+            conn.close()
+
+    def get_context_messages(self, conversation_id, user_id, token_budget, limit=50):
+        """Get the newest turns of a conversation fitting in token_budget
+
+        Returns None when the conversation does not belong to the user.
+        """
+        conn = self.get_connection()
+        try:
+            with conn.cursor(dictionary=True) as cursor:
+                cursor.execute(
+                    'SELECT id FROM conversations WHERE id = %s AND user_id = %s',
+                    (conversation_id, user_id)
+                )
+                if cursor.fetchone() is None:
+                    return None
+
+                # Les plus récents d'abord, via l'index (conversation_id, id)
+                cursor.execute(
+                    'SELECT role, content, token_count FROM messages '
+                    'WHERE conversation_id = %s ORDER BY id DESC LIMIT %s',
+                    (conversation_id, limit)
+                )
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        context = []
+        used = 0
+        for row in rows:
+            used += row['token_count']
+            if used > token_budget:
+                break
+            context.append({'role': row['role'], 'content': row['content']})
+        context.reverse()
+
+        # Le contexte commence toujours par une question de l'utilisateur
+        while context and context[0]['role'] != 'user':
+            context.pop(0)
+        return context
+
+    def append_messages(self, conversation_id, messages):
+        """Append several turns to a conversation in a single transaction"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.executemany(
+                    'INSERT INTO messages (conversation_id, role, content, token_count) '
+                    'VALUES (%s, %s, %s, %s)',
+                    [
+                        (conversation_id, message['role'], message['content'],
+                         estimate_tokens(message['content']))
+                        for message in messages
+                    ]
+                )
+                cursor.execute(
+                    'UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE id = %s',
+                    (conversation_id,)
+                )
+            conn.commit()
+            return True
+        except self.Error:
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
+    def create_job(self, job_id, user_id, model, request, conversation_id=None):
+        """Queue an asynchronous chat job"""
+        now = time.time()
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    'INSERT INTO chat_jobs (id, user_id, conversation_id, model, status, request, created_at, updated_at) '
+                    "VALUES (%s, %s, %s, %s, 'queued', %s, %s, %s)",
+                    (job_id, user_id, conversation_id, model, json.dumps(request), now, now)
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_job(self, job_id, user_id=None):
+        """Get a job, restricted to its owner when user_id is given"""
+        sql = 'SELECT * FROM chat_jobs WHERE id = %s'
+        params = [job_id]
+        if user_id is not None:
+            sql += ' AND user_id = %s'
+            params.append(user_id)
+        conn = self.get_connection()
+        try:
+            with conn.cursor(dictionary=True) as cursor:
+                cursor.execute(sql, params)
+                job = cursor.fetchone()
+        finally:
+            conn.close()
+        if job:
+            for column in ('request', 'result'):
+                if isinstance(job[column], str):
+                    job[column] = json.loads(job[column])
+        return job
+
+    def queued_jobs(self, limit=10):
+        """Ids of the oldest queued jobs"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id FROM chat_jobs WHERE status = 'queued' ORDER BY created_at LIMIT %s",
+                    (limit,)
+                )
+                return [row[0] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def _update_job(self, sql, params):
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                updated = cursor.rowcount
+            conn.commit()
+            return updated
+        finally:
+            conn.close()
+
+    def claim_job(self, job_id):
+        """Atomically move a queued job to running; False if another worker won"""
+        return self._update_job(
+            "UPDATE chat_jobs SET status = 'running', updated_at = %s WHERE id = %s AND status = 'queued'",
+            (time.time(), job_id)
+        ) == 1
+
+    def touch_job(self, job_id):
+        """Heartbeat of a running job; False once it has been cancelled"""
+        return self._update_job(
+            "UPDATE chat_jobs SET updated_at = %s WHERE id = %s AND status = 'running'",
+            (time.time(), job_id)
+        ) == 1
+
+    def finish_job(self, job_id, status, result=None, error=None):
+        """Record the outcome of a running job"""
+        return self._update_job(
+            "UPDATE chat_jobs SET status = %s, result = %s, error = %s, updated_at = %s "
+            "WHERE id = %s AND status = 'running'",
+            (status, json.dumps(result) if result is not None else None,
+             error[:255] if error else None, time.time(), job_id)
+        ) == 1
+
+    def requeue_job(self, job_id):
+        """Put a running job back in the queue"""
+        return self._update_job(
+            "UPDATE chat_jobs SET status = 'queued', updated_at = %s WHERE id = %s AND status = 'running'",
+            (time.time(), job_id)
+        ) == 1
+
+    def cancel_job(self, job_id, user_id):
+        """Cancel a queued or running job of the user"""
+        return self._update_job(
+            "UPDATE chat_jobs SET status = 'cancelled', updated_at = %s "
+            "WHERE id = %s AND user_id = %s AND status IN ('queued', 'running')",
+            (time.time(), job_id, user_id)
+        ) == 1
+
+    def expire_jobs(self, finished_before, stale_before):
+        """Delete old finished jobs and requeue running jobs without heartbeat"""
+        deleted = self._update_job(
+            "DELETE FROM chat_jobs WHERE status IN ('done', 'failed', 'cancelled') AND updated_at < %s",
+            (finished_before,)
+        )
+        requeued = self._update_job(
+            "UPDATE chat_jobs SET status = 'queued', updated_at = %s WHERE status = 'running' AND updated_at < %s",
+            (time.time(), stale_before)
+        )
+        return deleted, requeued
+
+    def get_user_quota(self, user_id):
+        """Get the quota override of a user ('requests=60/60,...' or None)"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT quota FROM users WHERE id = %s', (user_id,))
+                row = cursor.fetchone()
+                return row[0] if row else None
+        finally:
+            conn.close()
+
+    def set_user_quota(self, user_id, quota):
+        """Set or clear (None) the quota override of a user"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('UPDATE users SET quota = %s WHERE id = %s', (quota, user_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def take_quota(self, user_id, bucket, capacity, rate, cost=1, minimum=None, force=False):
+        """Refill a token bucket, then take cost from it if at least minimum remain
+
+        minimum defaults to cost; force always takes (the level may go
+        negative). The refill and the take are a single UPDATE, so concurrent
+        workers never lose a withdrawal. Returns (taken, level afterwards).
+        """
+        minimum = cost if minimum is None else minimum
+        now = time.time()
+        level = f'{self.least}(%s, tokens + (%s - updated_at) * %s)'
+        sql = f'UPDATE quota_buckets SET tokens = {level} - %s, updated_at = %s WHERE user_id = %s AND bucket = %s'
+        params = [capacity, now, rate, cost, now, user_id, bucket]
+        if not force:
+            sql += f' AND {level} >= %s'
+            params += [capacity, now, rate, minimum]
+
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                for _ in range(2):
+                    cursor.execute(sql, params)
+                    taken = cursor.rowcount == 1
+                    cursor.execute(
+                        'SELECT tokens, updated_at FROM quota_buckets WHERE user_id = %s AND bucket = %s',
+                        (user_id, bucket)
+                    )
+                    row = cursor.fetchone()
+                    if row is not None:
+                        break
+                    # Premier passage : seau plein, puis nouvel essai
+                    try:
+                        cursor.execute(
+                            'INSERT INTO quota_buckets (user_id, bucket, tokens, updated_at) VALUES (%s, %s, %s, %s)',
+                            (user_id, bucket, capacity, now)
+                        )
+                    except self.IntegrityError:
+                        pass
+            conn.commit()
+        finally:
+            conn.close()
+        if row is None:
+            # Utilisateur supprimé entre-temps
+            return True, capacity
+        tokens, updated_at = row
+        return taken, min(capacity, tokens + max(now - updated_at, 0) * rate)
+
+USER_FIELDS = ('id', 'username', 'is_admin', 'quota', 'created_at')
+
+def encode_cursor(position):
+    """Opaque pagination cursor from the sort key of the last row"""
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        position = None
+    # [clé de tri, id] : created_at ou username, puis l'id de la dernière ligne
+    if not isinstance(position, list) or len(position) != 2 \
+            or not isinstance(position[0], (str, int, float)) or isinstance(position[0], bool) \
+            or not isinstance(position[1], int) or isinstance(position[1], bool):
+        raise ValueError('Curseur de pagination invalide')
+    return position
+
+def escape_like(value):
+    """Escape LIKE wildcards with the '!' escape character"""
+    return value.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+
+def estimate_tokens(text):
+    """Approximate token count (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+def build_system_prompt(preferences):
+    """Build the system message sent to the model from user preferences"""
+    system_msg = preferences.get('system_message', '')
+    if preferences.get('interests'):
+        system_msg += f"\nCentres d'intérêt de l'utilisateur: {', '.join(preferences['interests'])}"
+    return system_msg
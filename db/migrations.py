@@ -0,0 +1,48 @@
+"""Versioned schema migrations
+
+Each backend has its own directory under db/schema/ holding files named
+NNNN_description.sql. Applied versions are recorded in schema_migrations,
+so a database that is already current costs a single query.
+"""
+
+from pathlib import Path
+
+SCHEMA_DIR = Path(__file__).parent / 'schema'
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class Migration:
+    def __init__(self, path):
+        version, _, name = path.stem.partition('_')
+        self.path = path
+        self.version = int(version)
+        self.name = name
+
+    def read(self):
+        return self.path.read_text(encoding='utf-8')
+
+
+def load_migrations(backend):
+    """Return the migrations of a backend, ordered by version"""
+    return sorted(
+        (Migration(path) for path in (SCHEMA_DIR / backend).glob('*.sql')),
+        key=lambda migration: migration.version
+    )
+
+
+def split_statements(sql):
+    """Split a script on semicolons, dropping comment-only chunks"""
+    statements = []
+    for chunk in sql.split(';'):
+        lines = [line for line in chunk.splitlines() if not line.strip().startswith('--')]
+        statement = '\n'.join(lines).strip()
+        if statement:
+            statements.append(statement)
+    return statements
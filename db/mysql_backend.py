@@ -0,0 +1,98 @@
+import mysql.connector
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import metrics
+from db.base import Database
+from db.pool import ConnectionPool, PoolTimeout
+
+class MySQLDatabase(Database):
+    Error = mysql.connector.Error
+    IntegrityError = mysql.connector.IntegrityError
+
+    schema = 'mysql'
+
+    def __init__(self):
+        super().__init__()
+        self.pool_config = {
+            'host': os.getenv('MYSQL_HOST', 'localhost'),
+            'port': int(os.getenv('MYSQL_PORT', 3306)),
+            'database': os.getenv('MYSQL_DATABASE', 'ia_chat'),
+            'user': os.getenv('MYSQL_USER', 'ia_user'),
+            'password': os.getenv('MYSQL_PASSWORD', 'ia_password')
+        }
+        self.lock_timeout = int(os.getenv('MYSQL_MIGRATION_LOCK_TIMEOUT', 60))
+
+        # Pool créé à la première requête, dans le processus qui l'utilise
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        """Connection pool of this process, created on first use"""
+        pool = self._pool
+        if pool is not None and self._pool_pid == os.getpid():
+            return pool
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                # Après un fork, les sockets du parent ne sont pas réutilisées
+                self._pool = ConnectionPool(
+                    lambda: mysql.connector.connect(**self.pool_config),
+                    min_size=int(os.getenv('MYSQL_POOL_MIN', 2)),
+                    max_size=int(os.getenv('MYSQL_POOL_MAX', 20)),
+                    timeout=float(os.getenv('MYSQL_POOL_TIMEOUT', 5)),
+                    max_idle=float(os.getenv('MYSQL_POOL_MAX_IDLE', 300)),
+                    validate_after=float(os.getenv('MYSQL_POOL_VALIDATE_AFTER', 30)),
+                    # Ping uniquement après une période d'inactivité, au lieu d'un
+                    # reset de session à chaque emprunt
+                    validate=lambda conn: conn.is_connected(),
+                    reset=lambda conn: conn.rollback() if conn.in_transaction else None
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    @contextmanager
+    def _schema_lock(self, conn):
+        """Serialize migrations between processes sharing the database"""
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK('ia_chat_migrations', %s)", (self.lock_timeout,))
+            if cursor.fetchone()[0] != 1:
+                raise self.Error(msg='Verrou de migration non obtenu')
+        try:
+            yield
+        finally:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT RELEASE_LOCK('ia_chat_migrations')")
+                cursor.fetchone()
+
+    def get_connection(self):
+        """Get a database connection from the pool"""
+        start = time.perf_counter()
+        try:
+            return self.pool.get_connection()
+        except PoolTimeout:
+            metrics.db_pool_exhausted.inc()
+            raise
+        finally:
+            metrics.db_pool_wait.observe(time.perf_counter() - start)
+
+    def open_pool(self):
+        """Create the pool of this process (min_size connections)"""
+        return self.pool
+
+    def close_pool(self):
+        """Close the pool of this process; the next query opens a new one"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            owned = self._pool_pid == os.getpid()
+        if pool is not None and owned:
+            pool.close()
+
+    def pool_stats(self):
+        """Size, usage and checkout wait statistics of the pool"""
+        if self._pool is None or self._pool_pid != os.getpid():
+            return None
+        return self._pool.stats()
@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque
+
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout"""
+
+class PooledConnection:
+    """Connection checked out of a ConnectionPool; close() gives it back"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn)
+
+class ConnectionPool:
+    """Elastic connection pool with a bounded checkout wait
+
+    The pool grows up to max_size under load and closes connections idle for
+    more than max_idle seconds, down to min_size. A connection is only
+    validated when it has been idle for more than validate_after seconds.
+    """
+
+    def __init__(self, connect, min_size=2, max_size=20, timeout=5.0,
+                 max_idle=300.0, validate_after=30.0, validate=None, reset=None):
+        self._connect = connect
+        self._validate = validate
+        self._reset = reset
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.validate_after = validate_after
+
+        self._cond = threading.Condition()
+        self.closed = False
+        # Connexions libres (connexion, dernière utilisation), la plus récente à droite
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def get_connection(self):
+        """Check a connection out, waiting at most timeout seconds"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        expired = []
+        with self._cond:
+            while True:
+                expired += self._collect_expired()
+                if self._idle:
+                    # LIFO : les connexions chaudes servent, les autres vieillissent
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    conn, last_used = None, None
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f'Aucune connexion disponible après {self.timeout}s')
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            self._in_use += 1
+
+            wait = time.monotonic() - start
+            self._checkouts += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+
+        self._close_all(expired)
+
+        try:
+            if conn is not None and time.monotonic() - last_used > self.validate_after:
+                if self._validate and not self._validate(conn):
+                    self._close_all([conn])
+                    conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            self._discard()
+            raise
+        return PooledConnection(self, conn)
+
+    def _release(self, conn):
+        try:
+            if self._reset:
+                self._reset(conn)
+        except Exception:
+            self._close_all([conn])
+            self._discard()
+            return
+        with self._cond:
+            closed = self.closed
+            if not closed:
+                self._in_use -= 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+        if closed:
+            # Pool fermé pendant l'emprunt : la connexion n'y retourne pas
+            self._close_all([conn])
+            self._discard()
+
+    def _discard(self):
+        """Forget a checked-out connection that is broken or failed to open"""
+        with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            self._cond.notify()
+
+    def _collect_expired(self):
+        # Appelé sous verrou : retire les connexions inactives depuis trop longtemps
+        expired = []
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            expired.append(self._idle.popleft()[0])
+            self._size -= 1
+        return expired
+
+    def close(self):
+        """Close the idle connections; checked-out ones close on release"""
+        with self._cond:
+            self.closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+        self._close_all(idle)
+
+    @staticmethod
+    def _close_all(connections):
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiters': self._waiters,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'wait_avg': self._wait_total / self._checkouts if self._checkouts else 0.0,
+                'wait_max': self._wait_max
+            }
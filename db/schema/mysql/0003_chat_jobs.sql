@@ -0,0 +1,18 @@
+-- Générations asynchrones (mode job) : la file survit au redémarrage des workers.
+-- Les horodatages sont des secondes epoch, comparées directement par les workers.
+CREATE TABLE IF NOT EXISTS chat_jobs (
+    id CHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    conversation_id INT DEFAULT NULL,
+    model VARCHAR(100) NOT NULL,
+    status ENUM('queued', 'running', 'done', 'failed', 'cancelled') NOT NULL DEFAULT 'queued',
+    request JSON NOT NULL,
+    result JSON DEFAULT NULL,
+    error VARCHAR(255) DEFAULT NULL,
+    created_at DOUBLE NOT NULL,
+    updated_at DOUBLE NOT NULL,
+    INDEX idx_status_created (status, created_at),
+    INDEX idx_status_updated (status, updated_at),
+    INDEX idx_jobs_user (user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
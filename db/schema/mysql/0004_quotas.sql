@@ -0,0 +1,12 @@
+-- Quotas par utilisateur : limites propres (ex. "requests=60/60,tokens=50000/3600")
+ALTER TABLE users ADD COLUMN quota VARCHAR(255) DEFAULT NULL;
+
+-- Seaux de jetons partagés par tous les workers (niveau et dernière mise à jour, secondes epoch)
+CREATE TABLE IF NOT EXISTS quota_buckets (
+    user_id INT NOT NULL,
+    bucket VARCHAR(20) NOT NULL,
+    tokens DOUBLE NOT NULL,
+    updated_at DOUBLE NOT NULL,
+    PRIMARY KEY (user_id, bucket),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
@@ -0,0 +1,52 @@
+-- Schéma SQLite équivalent à schema/mysql/0001_initial.sql
+
+-- Table des utilisateurs
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    password VARCHAR(100) NOT NULL,
+    is_admin BOOLEAN DEFAULT 0,
+    preferences TEXT DEFAULT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_created_at ON users (created_at);
+
+-- Table des préférences par défaut
+CREATE TABLE IF NOT EXISTS default_preferences (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    preferences TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Création de l'admin par défaut si n'existe pas
+INSERT OR IGNORE INTO users (username, password, is_admin)
+VALUES ('admin', 'admin', 1);
+
+-- Préférences par défaut
+INSERT OR IGNORE INTO default_preferences (id, preferences) VALUES (1, '{
+    "language": "fr",
+    "interests": [],
+    "model": "phi",
+    "system_message": "Tu es Fusikab IA, un assistant qui aide les utilisateurs de manière amicale et professionnelle, spécialisé dans la musique et le DJing."
+}');
+
+-- Conversations des utilisateurs
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    title VARCHAR(100) DEFAULT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_user_updated ON conversations (user_id, updated_at);
+
+-- Messages d'une conversation
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id INTEGER NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+    role TEXT NOT NULL CHECK (role IN ('user', 'assistant')),
+    content TEXT NOT NULL,
+    token_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_conversation_id ON messages (conversation_id, id);
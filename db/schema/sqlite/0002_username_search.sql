@@ -0,0 +1,3 @@
+-- Recherche par préfixe insensible à la casse : LIKE n'utilise un index
+-- SQLite que s'il est en collation NOCASE
+CREATE INDEX IF NOT EXISTS idx_username_nocase ON users (username COLLATE NOCASE);
@@ -0,0 +1,17 @@
+-- Générations asynchrones (mode job), équivalent de schema/mysql/0003_chat_jobs.sql
+CREATE TABLE IF NOT EXISTS chat_jobs (
+    id CHAR(32) PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    conversation_id INTEGER DEFAULT NULL,
+    model VARCHAR(100) NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+    request TEXT NOT NULL,
+    result TEXT DEFAULT NULL,
+    error VARCHAR(255) DEFAULT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_status_created ON chat_jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_status_updated ON chat_jobs (status, updated_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON chat_jobs (user_id);
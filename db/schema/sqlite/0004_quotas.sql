@@ -0,0 +1,10 @@
+-- Quotas par utilisateur, équivalent de schema/mysql/0004_quotas.sql
+ALTER TABLE users ADD COLUMN quota VARCHAR(255) DEFAULT NULL;
+
+CREATE TABLE IF NOT EXISTS quota_buckets (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    bucket VARCHAR(20) NOT NULL,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, bucket)
+);
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from db.base import Database
+
+@lru_cache(maxsize=256)
+def _translate(sql):
+    """Convert %s placeholders to the qmark style used by sqlite3"""
+    return sql.replace('%s', '?')
+
+class _Cursor:
+    """sqlite3 cursor exposing the subset of the mysql.connector API we use"""
+
+    def __init__(self, cursor, dictionary):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(_translate(sql), params)
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(_translate(sql), seq_of_params)
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+class _Connection:
+    """Per-thread connection; close() only ends the pending transaction"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, dictionary=False):
+        return _Cursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+class SQLiteDatabase(Database):
+    """Embedded backend for single-node installs, in WAL mode"""
+
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    json_text = "json_extract({column}, '{path}')"
+
+    least = 'MIN'
+
+    # Même collation que idx_username_nocase, comme MySQL (insensible à la casse)
+    username_key = 'username COLLATE NOCASE'
+
+    # Plus grand id : approximation sans parcours (ignore les suppressions)
+    user_count_estimate = "SELECT MAX(id) FROM users"
+
+    schema = 'sqlite'
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or os.getenv('SQLITE_PATH', 'data/ia_chat.db')
+        self.busy_timeout = float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connect(self):
+        # Le cache d'instructions de sqlite3 garde les requêtes préparées
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            cached_statements=256,
+            check_same_thread=False
+        )
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA foreign_keys = ON')
+        return conn
+
+    def get_connection(self):
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        # Une connexion héritée d'un fork n'est jamais réutilisée
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = _Connection(self._connect())
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _schema_lock(self, conn):
+        """Take the write lock for the whole migration run"""
+        with conn.cursor() as cursor:
+            cursor.execute('BEGIN IMMEDIATE')
+        yield
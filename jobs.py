@@ -0,0 +1,238 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from dotenv import load_dotenv
+
+import metrics
+from db.database import db
+from backends import backend_pool
+from model_manager import model_manager
+from ollama_client import OllamaError
+from quotas import quota_manager
+from scheduler import scheduler, QueueFull, QueueTimeout, PRIORITY_USER
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATES = ('done', 'failed', 'cancelled')
+
+
+class JobRunner:
+    """Exécute les chats en mode job dans un pool de threads dédié
+
+    L'état vit dans la table chat_jobs : un job en file survit au redémarrage
+    d'un worker et n'importe quel processus peut le réclamer. Un job en cours
+    envoie un battement régulier ; sans battement, il est remis en file.
+    """
+
+    def __init__(self, workers=None, poll_interval=None, heartbeat=None, result_ttl=None, stale_after=None):
+        self.workers = int(workers or os.getenv('JOB_WORKERS', 2))
+        self.poll_interval = float(poll_interval or os.getenv('JOB_POLL_INTERVAL', 1))
+        self.heartbeat = float(heartbeat or os.getenv('JOB_HEARTBEAT', 5))
+        self.result_ttl = float(result_ttl or os.getenv('JOB_RESULT_TTL', 3600))
+        self.stale_after = float(stale_after or os.getenv('JOB_STALE_AFTER', 60))
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        # Réveille les clients en attente quand un job de ce processus change d'état
+        self._changed = threading.Condition()
+        self._threads = []
+
+    def submit(self, user_id, model, messages, new_turns=None, conversation_id=None,
+               priority=PRIORITY_USER, options=None, is_admin=False, new_conversation=False):
+        """Enregistre le job et renvoie son identifiant sans attendre"""
+        job_id = uuid.uuid4().hex
+        db.create_job(job_id, user_id, model, {
+            'messages': messages,
+            'new_turns': new_turns or [],
+            'priority': priority,
+            'options': options,
+            'is_admin': is_admin,
+            'new_conversation': new_conversation
+        }, conversation_id)
+        metrics.jobs.inc(status='queued')
+        self._wake.set()
+        return job_id
+
+    def cancel(self, job_id, user_id):
+        cancelled = db.cancel_job(job_id, user_id)
+        if cancelled:
+            metrics.jobs.inc(status='cancelled')
+            self._discard_conversation(db.get_job(job_id, user_id))
+            self._notify()
+        return cancelled
+
+    def _discard_conversation(self, job):
+        """Supprime la conversation créée pour un job qui n'a pas abouti"""
+        if not job or not job['conversation_id'] or not job['request'].get('new_conversation'):
+            return
+        try:
+            db.discard_conversation(job['conversation_id'])
+        except Exception as e:
+            logger.warning(f'Erreur suppression conversation {job["conversation_id"]}: {str(e)}')
+
+    def wait(self, job_id, user_id, timeout):
+        """Attend au plus timeout secondes que le job se termine (long-poll)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = db.get_job(job_id, user_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in FINAL_STATES or remaining <= 0:
+                return job
+            # Le job peut tourner dans un autre processus : relecture périodique
+            with self._changed:
+                self._changed.wait(min(remaining, self.poll_interval))
+
+    def start(self):
+        """Démarre les threads d'exécution et de ménage"""
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._work, name=f'chat-job-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads.append(threading.Thread(target=self._janitor, name='chat-job-janitor', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job_id = self._claim_next()
+            except Exception as e:
+                logger.warning(f'Erreur lecture de la file des jobs: {str(e)}')
+                job_id = None
+            if job_id is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._execute(job_id)
+
+    def _claim_next(self):
+        for job_id in db.queued_jobs(limit=self.workers):
+            # Plusieurs processus peuvent viser le même job : un seul l'obtient
+            if db.claim_job(job_id):
+                return job_id
+        return None
+
+    def _execute(self, job_id):
+        job = db.get_job(job_id)
+        if job is None:
+            return
+        self._notify()
+        request = job['request']
+        model = job['model']
+
+        try:
+            slot = scheduler.acquire(model, request.get('priority', PRIORITY_USER))
+        except (QueueFull, QueueTimeout) as e:
+            # Modèle saturé : le job retourne en file et sera repris plus tard
+            db.requeue_job(job_id)
+            self._stop.wait(e.retry_after)
+            return
+
+        try:
+            result = self._generate(job_id, model, request)
+        except (OllamaError, OSError) as e:
+            logger.error(f'Erreur job {job_id}: {str(e)}')
+            db.finish_job(job_id, 'failed', error=str(e))
+            metrics.jobs.inc(status='failed')
+            self._discard_conversation(job)
+            self._notify()
+            return
+        except Exception as e:
+            logger.error(f'Erreur job {job_id}: {str(e)}')
+            db.finish_job(job_id, 'failed', error='Erreur interne')
+            metrics.jobs.inc(status='failed')
+            self._discard_conversation(job)
+            self._notify()
+            return
+        finally:
+            slot.release()
+
+        if result is None:
+            # Annulé pendant la génération
+            self._discard_conversation(job)
+            self._notify()
+            return
+
+        metrics.observe_ollama(result)
+        quota_manager.charge(job['user_id'], request.get('is_admin', False), result)
+        if db.finish_job(job_id, 'done', result={k: v for k, v in result.items() if k != 'context'}):
+            metrics.jobs.inc(status='done')
+            if request['new_turns'] and job['conversation_id']:
+                db.append_messages(job['conversation_id'], [*request['new_turns'], result['message']])
+        self._notify()
+
+    def _generate(self, job_id, model, request):
+        """Génère en flux pour pouvoir battre et détecter l'annulation"""
+        chunks = backend_pool.chat_stream(
+            model, request['messages'],
+            options=request.get('options'),
+            keep_alive=model_manager.record_use(model)
+        )
+        reply = []
+        last_beat = time.monotonic()
+        try:
+            for chunk in chunks:
+                if 'error' in chunk:
+                    raise OllamaError(chunk['error'])
+                if chunk.get('done'):
+                    result = dict(chunk)
+                    result['message'] = {'role': 'assistant', 'content': ''.join(reply)}
+                    return result
+                reply.append(chunk.get('message', {}).get('content', ''))
+
+                if time.monotonic() - last_beat >= self.heartbeat:
+                    last_beat = time.monotonic()
+                    if not db.touch_job(job_id):
+                        return None
+        finally:
+            chunks.close()
+        raise OllamaError('Flux interrompu avant la fin de la génération')
+
+    def _janitor(self):
+        while not self._stop.wait(min(self.stale_after, 60)):
+            now = time.time()
+            try:
+                deleted, requeued = db.expire_jobs(now - self.result_ttl, now - self.stale_after)
+                if requeued:
+                    logger.warning(f'{requeued} job(s) sans battement remis en file')
+                    self._wake.set()
+            except Exception as e:
+                logger.warning(f'Erreur ménage des jobs: {str(e)}')
+
+
+def describe(job):
+    """Représentation JSON d'un job pour son propriétaire"""
+    view = {
+        'id': job['id'],
+        'status': job['status'],
+        'model': job['model'],
+        'conversation_id': job['conversation_id'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }
+    if job['status'] == 'done' and job['result']:
+        view['result'] = job['result']
+    if job['error']:
+        view['error'] = job['error']
+    return view
+
+
+# Pool partagé par les routes du chat
+job_runner = JobRunner()
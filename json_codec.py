@@ -0,0 +1,25 @@
+import json
+
+# JSON partagé par Flask, le flux NDJSON et le client Ollama : orjson (en C,
+# plusieurs fois plus rapide) s'il est installé, sinon le module json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Les dates passent par default (format HTTP de Flask, comme sans orjson)
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+
+def dumps(obj, default=None):
+    """Sérialise en str compact, sans échappement des caractères non ASCII"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS).decode('utf-8')
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(data):
+    """Désérialise du str ou des octets UTF-8"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
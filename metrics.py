@@ -0,0 +1,206 @@
+import bisect
+import threading
+
+# Bornes par défaut des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        return [f'{self.name}{self._format_labels(key)} {value}' for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Jauge dont la valeur est lue au moment de l'export"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self):
+        values = dict(self._values)
+        if self.callback:
+            # Le callback renvoie {(label, ...): valeur}
+            values.update(self.callback())
+        return [f'{self.name}{self._format_labels(key)} {value}' for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{self._format_labels(key, ("le", bound))} {cumulative}')
+            lines.append(f'{self.name}_bucket{self._format_labels(key, ("le", "+Inf"))} {count}')
+            lines.append(f'{self.name}_sum{self._format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{self._format_labels(key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self):
+        """Export au format texte Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+registry = Registry()
+
+# Requêtes HTTP
+http_requests = registry.counter(
+    'http_requests_total', 'Requêtes HTTP traitées', ('route', 'method', 'status'))
+http_latency = registry.histogram(
+    'http_request_duration_seconds', 'Durée de traitement des requêtes HTTP', ('route', 'method'))
+
+# Appels Ollama (durées renvoyées par Ollama, en secondes)
+ollama_load = registry.histogram(
+    'ollama_load_duration_seconds', 'Temps de chargement du modèle', ('model',))
+ollama_prompt_eval = registry.histogram(
+    'ollama_prompt_eval_duration_seconds', 'Temps d\'évaluation du prompt', ('model',))
+ollama_eval = registry.histogram(
+    'ollama_eval_duration_seconds', 'Temps de génération de la réponse', ('model',))
+ollama_tokens_per_second = registry.histogram(
+    'ollama_tokens_per_second', 'Débit de génération par appel', ('model',),
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200))
+ollama_eval_tokens = registry.counter(
+    'ollama_eval_tokens_total', 'Tokens générés', ('model',))
+ollama_eval_seconds = registry.counter(
+    'ollama_eval_seconds_total', 'Temps total de génération', ('model',))
+
+# Pool MySQL
+db_pool_wait = registry.histogram(
+    'db_pool_checkout_seconds', 'Attente pour obtenir une connexion du pool',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+db_pool_exhausted = registry.counter(
+    'db_pool_exhausted_total', 'Échecs d\'obtention de connexion (pool épuisé)')
+
+# Routage automatique des modèles
+model_routes = registry.counter(
+    'model_route_total', 'Paliers choisis par le mode auto', ('tier', 'reason'))
+
+# Base de connaissances
+retrieval_latency = registry.histogram(
+    'retrieval_duration_seconds', 'Durée d\'une recherche (embedding de la question compris)',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+
+# Mode job
+jobs = registry.counter(
+    'chat_jobs_total', 'Jobs de chat par changement d\'état', ('status',))
+
+# Quotas par utilisateur
+quota_rejections = registry.counter(
+    'quota_rejections_total', 'Requêtes refusées pour quota dépassé', ('bucket',))
+
+# Cache de la liste des modèles
+models_cache_requests = registry.counter(
+    'models_cache_requests_total', 'Accès au cache de la liste des modèles', ('result',))
+registry.gauge(
+    'models_cache_hit_ratio', 'Taux de succès du cache de la liste des modèles',
+    callback=lambda: {(): _ratio(models_cache_requests.value(result='fresh')
+                                 + models_cache_requests.value(result='stale'),
+                                 models_cache_requests.value(result='empty'))})
+
+
+def _ratio(hits, misses):
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def observe_ollama(result):
+    """Enregistre les statistiques d'un appel /api/chat terminé"""
+    model = result.get('model', '')
+    if result.get('load_duration'):
+        ollama_load.observe(result['load_duration'] / 1e9, model=model)
+    if result.get('prompt_eval_duration'):
+        ollama_prompt_eval.observe(result['prompt_eval_duration'] / 1e9, model=model)
+    if result.get('eval_duration'):
+        seconds = result['eval_duration'] / 1e9
+        tokens = result.get('eval_count') or 0
+        ollama_eval.observe(seconds, model=model)
+        ollama_eval_tokens.inc(tokens, model=model)
+        ollama_eval_seconds.inc(seconds, model=model)
+        if seconds > 0:
+            ollama_tokens_per_second.observe(tokens / seconds, model=model)
@@ -0,0 +1,136 @@
+import os
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+
+from backends import backend_pool
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+FRESH = 'fresh'
+STALE = 'stale'
+EMPTY = 'empty'
+
+
+class ModelCatalog:
+    """Liste des modèles Ollama servie sans jamais attendre Ollama
+
+    La liste est rafraîchie en arrière-plan avant son expiration, par un seul
+    appel à la fois. Si Ollama ne répond pas, la dernière liste connue reste
+    servie, marquée périmée. Les détails de /api/show sont gardés par digest.
+    """
+
+    def __init__(self, client=None, ttl=None, refresh_after=None, retry_after=None):
+        self.client = client or backend_pool
+        self.ttl = float(ttl or os.getenv('MODELS_CACHE_TTL', 3600))
+        # Rafraîchissement anticipé, avant que la liste ne soit périmée (jamais après)
+        self.refresh_after = min(
+            float(refresh_after or os.getenv('MODELS_REFRESH_AFTER') or self.ttl * 0.8), self.ttl)
+        # Délai entre deux tentatives quand Ollama est indisponible
+        self.retry_after = float(retry_after or os.getenv('MODELS_RETRY_AFTER', 30))
+
+        self._lock = threading.Lock()
+        self._models = None
+        self._fetched_at = None
+        self._attempted_at = None
+        self._error = None
+        self._refreshing = None
+        self._details = {}
+
+    def get(self):
+        """Renvoie (modèles, état, âge en secondes) sans appel bloquant"""
+        now = time.monotonic()
+        with self._lock:
+            models, fetched_at = self._models, self._fetched_at
+
+        if models is None:
+            self.refresh_async()
+            return [], EMPTY, None
+
+        age = now - fetched_at
+        if age >= self.refresh_after:
+            self.refresh_async()
+        return models, FRESH if age < self.ttl else STALE, age
+
+    def refresh_async(self):
+        """Lance un rafraîchissement, sauf s'il y en a déjà un en cours"""
+        with self._lock:
+            if self._refreshing is not None:
+                return self._refreshing
+            # Sans aucune liste connue, chaque demande peut relancer l'appel
+            if self._models is not None and self._error is not None \
+                    and time.monotonic() - self._attempted_at < self.retry_after:
+                return None
+            self._refreshing = threading.Event()
+            done = self._refreshing
+        threading.Thread(target=self._refresh, args=(done,), name='model-catalog', daemon=True).start()
+        return done
+
+    def refresh(self):
+        """Interroge /api/tags (et /api/show pour les nouveaux modèles)"""
+        models = []
+        for model in self.client.tags():
+            name = model['name'].replace(':latest', '')
+            details = model.get('details') or {}
+            models.append({
+                'name': name,
+                'size': f"{model['size']/(1024*1024*1024):.1f} GB",
+                'family': details.get('family'),
+                'parameter_size': details.get('parameter_size'),
+                'quantization': details.get('quantization_level'),
+                'context_length': self._context_length(model)
+            })
+        models.sort(key=lambda m: m['name'])
+
+        with self._lock:
+            self._models = models
+            self._fetched_at = time.monotonic()
+            self._error = None
+        return models
+
+    def _refresh(self, done):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f'Erreur rafraîchissement des modèles: {str(e)}')
+            with self._lock:
+                self._error = str(e)
+        finally:
+            with self._lock:
+                self._attempted_at = time.monotonic()
+                self._refreshing = None
+            done.set()
+
+    def _context_length(self, model):
+        # Un digest identique désigne les mêmes poids : /api/show une seule fois
+        key = model.get('digest') or model['name']
+        with self._lock:
+            if key in self._details:
+                return self._details[key]
+        try:
+            info = self.client.show(model['name']).get('model_info') or {}
+        except Exception as e:
+            logger.warning(f"Erreur /api/show pour {model['name']}: {str(e)}")
+            return None
+        context_length = next(
+            (value for name, value in info.items() if name.endswith('.context_length')), None)
+        with self._lock:
+            self._details[key] = context_length
+        return context_length
+
+    def status(self):
+        with self._lock:
+            return {
+                'models': len(self._models or []),
+                'age': None if self._fetched_at is None else round(time.monotonic() - self._fetched_at, 1),
+                'refreshing': self._refreshing is not None,
+                'error': self._error
+            }
+
+
+# Catalogue partagé par les routes du chat
+model_catalog = ModelCatalog()
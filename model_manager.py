@@ -0,0 +1,117 @@
+import os
+import time
+import logging
+import threading
+from collections import defaultdict, deque
+from dotenv import load_dotenv
+
+from backends import backend_pool
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class ModelResidency:
+    """Garde en mémoire d'Ollama les modèles réellement utilisés
+
+    Préchauffe les modèles au démarrage, adapte le keep_alive envoyé à Ollama
+    selon l'usage récent et suit les modèles chargés via /api/ps.
+    """
+
+    def __init__(self, client=None, poll_interval=None, usage_window=None,
+                 hot_threshold=None, hot_keep_alive=None, cold_keep_alive=None):
+        self.client = client or backend_pool
+        self.poll_interval = float(poll_interval or os.getenv('MODEL_PS_INTERVAL', 30))
+        # Fenêtre d'observation de l'usage et nombre d'appels pour être "chaud"
+        self.usage_window = float(usage_window or os.getenv('MODEL_USAGE_WINDOW', 900))
+        self.hot_threshold = int(hot_threshold or os.getenv('MODEL_HOT_THRESHOLD', 3))
+        self.hot_keep_alive = hot_keep_alive or os.getenv('MODEL_HOT_KEEP_ALIVE', '30m')
+        self.cold_keep_alive = cold_keep_alive or os.getenv('MODEL_COLD_KEEP_ALIVE', '5m')
+
+        self._lock = threading.Lock()
+        self._usage = defaultdict(deque)
+        self._loaded = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def record_use(self, model):
+        """Note un appel au modèle et renvoie le keep_alive à transmettre"""
+        now = time.monotonic()
+        with self._lock:
+            usage = self._usage[normalize_name(model)]
+            usage.append(now)
+            while usage and now - usage[0] > self.usage_window:
+                usage.popleft()
+            hot = len(usage) >= self.hot_threshold
+        return self.hot_keep_alive if hot else self.cold_keep_alive
+
+    def is_loaded(self, model):
+        with self._lock:
+            return normalize_name(model) in self._loaded
+
+    def loaded_models(self):
+        """Modèles actuellement en mémoire d'Ollama, d'après le dernier /api/ps"""
+        with self._lock:
+            return list(self._loaded.values())
+
+    def refresh(self):
+        """Interroge /api/ps et met à jour l'état de résidence"""
+        loaded = {}
+        for model in self.client.ps():
+            name = normalize_name(model['name'])
+            loaded[name] = {
+                'name': name,
+                'size_vram': model.get('size_vram'),
+                'expires_at': model.get('expires_at')
+            }
+        with self._lock:
+            self._loaded = loaded
+        return loaded
+
+    def warm_up(self, models):
+        """Charge les modèles dans Ollama sans générer de texte"""
+        for model in dict.fromkeys(models):
+            if not model or self.is_loaded(model):
+                continue
+            try:
+                # Une requête sans message charge le modèle et rend la main
+                self.client.chat(model, [], keep_alive=self.hot_keep_alive)
+                logger.info(f'Modèle préchauffé: {model}')
+            except Exception as e:
+                logger.warning(f'Préchauffage impossible pour {model}: {str(e)}')
+
+    def start(self, models=()):
+        """Démarre le préchauffage puis le suivi périodique en arrière-plan"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(list(models),), name='model-residency', daemon=True
+            )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, models):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f'Erreur /api/ps: {str(e)}')
+        self.warm_up(models)
+
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f'Erreur /api/ps: {str(e)}')
+
+
+def normalize_name(name):
+    return name.replace(':latest', '')
+
+
+# Gestionnaire partagé par les routes du chat
+model_manager = ModelResidency()
@@ -0,0 +1,147 @@
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+import json_codec
+
+# Load environment variables
+load_dotenv()
+
+
+class OllamaError(Exception):
+    """Réponse en erreur renvoyée par l'API Ollama"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _ResetRetry(Retry):
+    """Rejoue les connexions coupées mais jamais une génération trop lente"""
+
+    def increment(self, method=None, url=None, response=None, error=None, *args, **kwargs):
+        if isinstance(error, ReadTimeoutError):
+            raise error
+        return super().increment(method, url, response, error, *args, **kwargs)
+
+
+def default_pool_size():
+    """Connexions gardées par nœud : une par thread pouvant appeler Ollama
+
+    Threads de requêtes (SERVER_THREADS, fixé par serve.py), lots et tâches
+    de fond du processus.
+    """
+    return (int(os.getenv('SERVER_THREADS') or 10)
+            + int(os.getenv('BATCH_MAX_CONCURRENCY', 4))
+            + int(os.getenv('JOB_WORKERS', 2)))
+
+
+class OllamaClient:
+    def __init__(self, host=None, port=None, pool_size=None,
+                 connect_timeout=None, read_timeout=None, retries=None):
+        host = host or os.getenv('OLLAMA_HOST', 'localhost')
+        port = port or os.getenv('OLLAMA_PORT', '11434')
+        self.base_url = f"http://{host}:{port}"
+
+        self.connect_timeout = float(connect_timeout or os.getenv('OLLAMA_CONNECT_TIMEOUT', 5))
+        self.read_timeout = float(read_timeout or os.getenv('OLLAMA_TIMEOUT', 30))
+        self.pool_size = int(pool_size or os.getenv('OLLAMA_POOL_SIZE') or default_pool_size())
+        retries = int(retries if retries is not None else os.getenv('OLLAMA_RETRIES', 2))
+
+        # Session partagée : connexions keep-alive réutilisées entre les requêtes.
+        # Pool plein : une connexion de plus est ouverte puis fermée, sans attente
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            pool_block=False,
+            max_retries=_ResetRetry(
+                total=retries,
+                connect=retries,
+                read=retries,
+                status=0,
+                allowed_methods=None,
+                raise_on_status=False
+            )
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _timeout(self, read_timeout=None):
+        return (self.connect_timeout, read_timeout or self.read_timeout)
+
+    def _request(self, method, path, read_timeout=None, **kwargs):
+        response = self.session.request(
+            method,
+            f"{self.base_url}{path}",
+            timeout=self._timeout(read_timeout),
+            **kwargs
+        )
+        if response.status_code != 200:
+            try:
+                message = json_codec.loads(response.content).get('error', response.reason)
+            except ValueError:
+                message = response.reason
+            response.close()
+            raise OllamaError(f'Erreur API Ollama: {message}', response.status_code)
+        return response
+
+    def chat(self, model: str, messages: List[Dict[str, str]],
+             options: Optional[Dict[str, Any]] = None,
+             keep_alive: Optional[str] = None) -> Dict[str, Any]:
+        """Génère une réponse complète via /api/chat"""
+        payload = self._chat_payload(model, messages, False, options, keep_alive)
+        return json_codec.loads(self._request('POST', '/api/chat', json=payload).content)
+
+    def chat_stream(self, model: str, messages: List[Dict[str, str]],
+                    options: Optional[Dict[str, Any]] = None,
+                    keep_alive: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Ouvre un flux /api/chat et renvoie un itérateur sur ses fragments
+
+        La requête part immédiatement, les erreurs HTTP sont donc levées ici
+        et non au premier fragment. Le timeout de lecture s'applique entre
+        deux fragments.
+        """
+        payload = self._chat_payload(model, messages, True, options, keep_alive)
+        response = self._request('POST', '/api/chat', json=payload, stream=True)
+        return self._iter_chunks(response)
+
+    def tags(self) -> List[Dict[str, Any]]:
+        """Liste les modèles installés (/api/tags)"""
+        return json_codec.loads(self._request('GET', '/api/tags', read_timeout=5).content).get('models', [])
+
+    def ps(self) -> List[Dict[str, Any]]:
+        """Liste les modèles chargés en mémoire (/api/ps)"""
+        return json_codec.loads(self._request('GET', '/api/ps', read_timeout=5).content).get('models', [])
+
+    def show(self, name: str) -> Dict[str, Any]:
+        """Détails d'un modèle : paramètres, quantification, contexte (/api/show)"""
+        return json_codec.loads(self._request('POST', '/api/show', read_timeout=5, json={'name': name}).content)
+
+    def embed(self, model: str, inputs: List[str]) -> List[List[float]]:
+        """Vecteurs d'embedding de plusieurs textes en un appel (/api/embed)"""
+        payload = {'model': model, 'input': inputs}
+        return json_codec.loads(self._request('POST', '/api/embed', json=payload).content)['embeddings']
+
+    @staticmethod
+    def _chat_payload(model, messages, stream, options, keep_alive):
+        payload = {'model': model, 'messages': messages, 'stream': stream}
+        if options:
+            payload['options'] = options
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+        return payload
+
+    @staticmethod
+    def _iter_chunks(response):
+        try:
+            for line in response.iter_lines():
+                if line:
+                    yield json_codec.loads(line)
+        finally:
+            response.close()
@@ -0,0 +1,169 @@
+import os
+import math
+import logging
+import threading
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+import metrics
+from db.database import db
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = 'requests'
+TOKENS = 'tokens'
+
+
+def parse_limits(value):
+    """Limites {seau: (capacité, période en s)} depuis 'requests=30/60,tokens=50000/3600'"""
+    limits = {}
+    for item in (value or '').split(','):
+        bucket, _, spec = item.strip().partition('=')
+        if not bucket:
+            continue
+        if bucket not in (REQUESTS, TOKENS):
+            raise ValueError(f'Quota inconnu: {bucket}')
+        capacity, _, period = spec.partition('/')
+        try:
+            capacity, period = float(capacity), float(period or 60)
+        except ValueError:
+            raise ValueError(f'Quota invalide: {item.strip()}') from None
+        if capacity <= 0 or period <= 0:
+            raise ValueError(f'Quota invalide: {item.strip()}')
+        limits[bucket] = (capacity, period)
+    return limits
+
+
+def format_limits(limits):
+    return ','.join(f'{bucket}={capacity:g}/{period:g}' for bucket, (capacity, period) in limits.items())
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, bucket, state, retry_after):
+        super().__init__('Quota de requêtes dépassé' if bucket == REQUESTS else 'Quota de jetons dépassé')
+        self.bucket = bucket
+        self.state = state
+        self.retry_after = retry_after
+
+
+class QuotaManager:
+    """Seaux de jetons par utilisateur : requêtes et jetons générés (eval_count)
+
+    Les niveaux vivent en base (table quota_buckets), donc tous les workers
+    gunicorn partagent les mêmes compteurs. Chaque rôle a ses limites ; la
+    colonne users.quota les remplace seau par seau. Sans limites pour le rôle
+    admin, les administrateurs sont exemptés.
+    """
+
+    def __init__(self, enabled=None, user_limits=None, admin_limits=None, cache_ttl=None):
+        if enabled is None:
+            enabled = os.getenv('QUOTA_ENABLED', 'False').lower() == 'true'
+        self.enabled = enabled
+        self.roles = {
+            'user': parse_limits(user_limits if user_limits is not None
+                                 else os.getenv('QUOTA_USER', 'requests=30/60,tokens=50000/3600')),
+            'admin': parse_limits(admin_limits if admin_limits is not None else os.getenv('QUOTA_ADMIN', ''))
+        }
+        # Limites propres à chaque utilisateur, relues au plus toutes les cache_ttl secondes
+        self._overrides = TTLCache(maxsize=10000, ttl=int(cache_ttl or os.getenv('QUOTA_CACHE_TTL', 60)))
+        self._lock = threading.Lock()
+
+    def limits(self, user_id, is_admin=False):
+        """Limites applicables ; vide si l'utilisateur est exempté"""
+        if not self.enabled:
+            return {}
+        role = 'admin' if is_admin else 'user'
+        if not self.roles[role]:
+            return {}
+        return {**self.roles[role], **self._override(user_id)}
+
+    def _override(self, user_id):
+        with self._lock:
+            if user_id in self._overrides:
+                return self._overrides[user_id]
+        try:
+            override = parse_limits(db.get_user_quota(user_id))
+        except ValueError as e:
+            logger.warning(f'Quota de l\'utilisateur {user_id} ignoré: {str(e)}')
+            override = {}
+        with self._lock:
+            self._overrides[user_id] = override
+        return override
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._overrides.pop(user_id, None)
+
+    def check(self, user_id, is_admin=False):
+        """Décompte une requête ; QuotaExceeded si un seau est vide
+
+        Le seau de jetons doit seulement être positif : le coût réel n'est
+        connu qu'à la fin de la génération (voir charge). Renvoie l'état des
+        seaux pour les en-têtes.
+        """
+        limits = self.limits(user_id, is_admin)
+        state = {}
+        # Jetons d'abord : un refus ne consomme pas de requête
+        for bucket, cost in ((TOKENS, 0), (REQUESTS, 1)):
+            if bucket not in limits:
+                continue
+            capacity, period = limits[bucket]
+            rate = capacity / period
+            try:
+                taken, level = db.take_quota(user_id, bucket, capacity, rate, cost=cost, minimum=1)
+            except Exception as e:
+                # Base indisponible : on laisse passer plutôt que de tout bloquer
+                logger.warning(f'Erreur quotas: {str(e)}')
+                return {}
+            state[bucket] = (capacity, level)
+            if not taken:
+                metrics.quota_rejections.inc(bucket=bucket)
+                raise QuotaExceeded(bucket, state, max(1, math.ceil((1 - level) / rate)))
+        return state
+
+    def refund(self, user_id, is_admin, state):
+        """Rend la requête décomptée par check() (requête rejetée ensuite)
+
+        Renvoie l'état des seaux mis à jour pour les en-têtes.
+        """
+        limits = self.limits(user_id, is_admin)
+        if REQUESTS not in state or REQUESTS not in limits:
+            return state
+        capacity, period = limits[REQUESTS]
+        try:
+            _, level = db.take_quota(user_id, REQUESTS, capacity, capacity / period, cost=-1, force=True)
+        except Exception as e:
+            logger.warning(f'Erreur quotas: {str(e)}')
+            return state
+        return {**state, REQUESTS: (capacity, level)}
+
+    def charge(self, user_id, is_admin, result):
+        """Débite les jetons générés (eval_count) ; le seau peut passer en négatif"""
+        tokens = result.get('eval_count') or 0
+        limits = self.limits(user_id, is_admin)
+        if not tokens or TOKENS not in limits:
+            return
+        capacity, period = limits[TOKENS]
+        try:
+            db.take_quota(user_id, TOKENS, capacity, capacity / period, cost=tokens, force=True)
+        except Exception as e:
+            logger.warning(f'Erreur quotas: {str(e)}')
+
+
+def quota_headers(state, retry_after=None):
+    """En-têtes X-RateLimit-* (et Retry-After en cas de refus)"""
+    headers = {}
+    for bucket, (capacity, level) in state.items():
+        name = bucket.capitalize()
+        headers[f'X-RateLimit-Limit-{name}'] = f'{capacity:g}'
+        headers[f'X-RateLimit-Remaining-{name}'] = str(max(0, math.floor(level)))
+    if retry_after is not None:
+        headers['Retry-After'] = str(retry_after)
+    return headers
+
+
+# Quotas partagés par les routes du chat
+quota_manager = QuotaManager()
@@ -74,7 +74,7 @@ def setup_mysql():
         subprocess.run([
             'mysql', '-u', 'root',
             'ia_chat',
-            '-e', f"source {os.path.join('db', 'init_mysql.sql')}"
+            '-e', f"source {os.path.join('db', 'schema', 'mysql', '0001_initial.sql')}"
         ], check=True)
         print("✓ Schéma de la base de données initialisé")
     except subprocess.CalledProcessError as e:
@@ -132,7 +132,8 @@ if __name__ == '__main__':
     print("=== Vérification des prérequis pour l'application IA Chat ===\n")
     if check_and_install_requirements():
         print("\nVous pouvez maintenant lancer l'application avec:")
-        print("python3 run.py")
+        print("python3 serve.py   (production, gunicorn)")
+        print("python3 run.py     (développement)")
     else:
         print("\n✗ Erreur lors de la vérification des prérequis")
         sys.exit(1)
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import logging
+import threading
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Cache des réponses du chat pour les questions posées mot pour mot
+
+    Deux niveaux : un TTLCache en mémoire propre au worker, et un répertoire
+    optionnel partagé par tous les workers gunicorn (un fichier JSON par clé).
+    Le répertoire est balayé au plus toutes les sweep_interval secondes après
+    une écriture : fichiers expirés supprimés, puis les plus anciens au-delà
+    de disk_max_files.
+    """
+
+    def __init__(self, enabled=None, maxsize=None, ttl=None, directory=None, excluded_models=None,
+                 disk_max_files=None, sweep_interval=None):
+        if enabled is None:
+            enabled = os.getenv('RESPONSE_CACHE_ENABLED', 'False').lower() == 'true'
+        self.enabled = enabled
+        self.ttl = int(ttl or os.getenv('RESPONSE_CACHE_TTL', 86400))
+        self.memory = TTLCache(
+            maxsize=int(maxsize or os.getenv('RESPONSE_CACHE_SIZE', 1000)),
+            ttl=self.ttl
+        )
+        self.directory = directory if directory is not None else os.getenv('RESPONSE_CACHE_DIR', '')
+        if excluded_models is None:
+            excluded_models = os.getenv('RESPONSE_CACHE_EXCLUDE_MODELS', '').split(',')
+        self.excluded_models = {normalize_model(m) for m in excluded_models if m.strip()}
+        self.disk_max_files = int(disk_max_files or os.getenv('RESPONSE_CACHE_DISK_MAX_FILES', 10000))
+        self.sweep_interval = float(sweep_interval or os.getenv('RESPONSE_CACHE_SWEEP_INTERVAL', 300))
+
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._sweeping = False
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def enabled_for(self, model):
+        return self.enabled and normalize_model(model) not in self.excluded_models
+
+    @staticmethod
+    def key(model, messages):
+        """Empreinte du modèle, du message système et des messages normalisés"""
+        normalized = [
+            [message.get('role', ''), ' '.join(str(message.get('content', '')).split()).casefold()]
+            for message in messages
+        ]
+        payload = json.dumps([normalize_model(model), normalized], ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            result = self.memory.get(key)
+        if result is None and self.directory:
+            result = self._disk_get(key)
+            if result is not None:
+                with self._lock:
+                    self.memory[key] = result
+                    self.disk_hits += 1
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def set(self, key, result):
+        with self._lock:
+            self.memory[key] = result
+        if self.directory:
+            self._disk_set(key, result)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'size': len(self.memory)
+            }
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def _disk_get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.unlink(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_set(self, key, result):
+        path = self._path(key)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            # Écriture atomique : un autre worker ne lit jamais un fichier partiel
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        with self._lock:
+            if self._sweeping or time.monotonic() - self._last_sweep < self.sweep_interval:
+                return
+            self._sweeping = True
+        # Hors de la requête : le parcours du répertoire peut être long
+        threading.Thread(target=self.sweep, daemon=True, name='response-cache-sweep').start()
+
+    def sweep(self):
+        """Supprime les fichiers expirés puis les plus anciens au-delà de la limite
+
+        Renvoie le nombre de fichiers supprimés. Plusieurs workers peuvent
+        balayer en même temps : un fichier déjà supprimé est ignoré.
+        """
+        removed = 0
+        try:
+            now = time.time()
+            entries = []
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        mtime = os.path.getmtime(path)
+                        # Fichiers temporaires d'une écriture interrompue : expirés aussi
+                        if now - mtime > self.ttl or (name.endswith('.tmp') and now - mtime > 60):
+                            os.unlink(path)
+                            removed += 1
+                        elif name.endswith('.json'):
+                            entries.append((mtime, path))
+                    except OSError:
+                        continue
+
+            entries.sort()
+            for _, path in entries[:max(0, len(entries) - self.disk_max_files)]:
+                try:
+                    os.unlink(path)
+                    removed += 1
+                except OSError:
+                    continue
+        except Exception as e:
+            logger.warning(f'Erreur nettoyage du cache de réponses: {str(e)}')
+        finally:
+            with self._lock:
+                self._sweeping = False
+                self._last_sweep = time.monotonic()
+        return removed
+
+
+def normalize_model(model):
+    return model.strip().replace(':latest', '')
+
+
+# Cache partagé par les routes du chat
+response_cache = ResponseCache()
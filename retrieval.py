@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""Base de connaissances locale, interrogée par similarité d'embeddings
+
+    python3 retrieval.py ingest [répertoire]
+    python3 retrieval.py search "question"
+
+Les documents (.md, .txt) sont découpés en passages, vectorisés par
+l'endpoint d'embeddings d'Ollama et rangés dans une matrice float32
+mappée en mémoire. Une ingestion ne revectorise que les passages nouveaux
+ou modifiés ; les workers rechargent l'index dès qu'il change.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import uuid
+import logging
+import threading
+from dotenv import load_dotenv
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import metrics
+from backends import backend_pool
+from db.database import estimate_tokens
+from timing import instrument
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = ('.md', '.txt')
+EMBED_BATCH = 32
+
+
+def chunk_text(text, max_tokens):
+    """Découpe en passages d'environ max_tokens, en respectant les paragraphes"""
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = ' '.join(paragraph.split())
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        # Paragraphe trop long : coupé entre les phrases
+        sentence_group = ''
+        for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+            if sentence_group and estimate_tokens(sentence_group + ' ' + sentence) > max_tokens:
+                pieces.append(sentence_group)
+                sentence_group = sentence
+            else:
+                sentence_group = f'{sentence_group} {sentence}'.strip()
+        if sentence_group:
+            pieces.append(sentence_group)
+
+    chunks, current = [], ''
+    for piece in pieces:
+        if current and estimate_tokens(current + '\n\n' + piece) > max_tokens:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f'{current}\n\n{piece}' if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def kmeans(vectors, k, iterations=10, sample=20000, seed=0):
+    """K-means sphérique sur un échantillon ; renvoie (centroïdes, affectations)"""
+    rng = np.random.default_rng(seed)
+    count = len(vectors)
+    rows = np.sort(rng.choice(count, min(count, sample), replace=False))
+    data = np.asarray(vectors[rows])
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        for cluster in range(k):
+            members = data[assign == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+        centroids = normalize(centroids)
+
+    # Affectation de toutes les lignes, par blocs pour borner la mémoire
+    assignments = np.concatenate([
+        np.argmax(vectors[start:start + 8192] @ centroids.T, axis=1)
+        for start in range(0, count, 8192)
+    ]).astype(np.int32)
+    return centroids.astype(np.float32), assignments
+
+
+class _Index:
+    """Index chargé : passages, matrice mappée et partition grossière éventuelle"""
+
+    def __init__(self, directory, manifest):
+        self.manifest = manifest
+        self.chunks = manifest['chunks']
+        version = manifest['version']
+        self.vectors = np.memmap(
+            os.path.join(directory, f'vectors.{version}.f32'), dtype=np.float32, mode='r',
+            shape=(len(self.chunks), manifest['dim'])
+        ) if self.chunks else np.zeros((0, manifest['dim']), dtype=np.float32)
+
+        self.centroids = None
+        if manifest.get('clusters'):
+            self.centroids = np.load(os.path.join(directory, f'centroids.{version}.npy'))
+            assignments = np.load(os.path.join(directory, f'assignments.{version}.npy'))
+            # Lignes de chaque cluster, contiguës après tri
+            order = np.argsort(assignments, kind='stable')
+            bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+            self.members = [order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))]
+
+    def search(self, query, k, nprobe):
+        if not len(self.chunks):
+            return []
+        if self.centroids is not None and nprobe < len(self.centroids):
+            closest = np.argpartition(-(self.centroids @ query), nprobe)[:nprobe]
+            rows = np.sort(np.concatenate([self.members[c] for c in closest]))
+            scores = self.vectors[rows] @ query
+        else:
+            rows = None
+            scores = self.vectors @ query
+
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self.chunks[int(rows[i] if rows is not None else i)], float(scores[i]))
+            for i in top
+        ]
+
+
+class KnowledgeBase:
+    """Passages de la base de connaissances les plus proches d'un message"""
+
+    def __init__(self, directory=None, source=None, model=None, enabled=None, chunk_tokens=None,
+                 top_k=None, min_score=None, max_tokens=None, ivf_min=None, nprobe=None):
+        if enabled is None:
+            enabled = os.getenv('RETRIEVAL_ENABLED', 'False').lower() == 'true'
+        # NumPy est optionnel : sans lui, le chat fonctionne sans base de connaissances
+        self.enabled = enabled and np is not None
+        self.directory = directory or os.getenv('RETRIEVAL_DIR', 'data/retrieval')
+        self.source = source or os.getenv('RETRIEVAL_SOURCE', 'knowledge')
+        self.model = model or os.getenv('RETRIEVAL_MODEL', 'nomic-embed-text')
+        self.chunk_tokens = int(chunk_tokens or os.getenv('RETRIEVAL_CHUNK_TOKENS', 200))
+        self.top_k = int(top_k or os.getenv('RETRIEVAL_TOP_K', 3))
+        self.min_score = float(min_score or os.getenv('RETRIEVAL_MIN_SCORE', 0.5))
+        self.max_tokens = int(max_tokens or os.getenv('RETRIEVAL_MAX_TOKENS', 600))
+        # Partition grossière (k-means) au-delà de ivf_min passages
+        self.ivf_min = int(ivf_min or os.getenv('RETRIEVAL_IVF_MIN', 20000))
+        self.nprobe = int(nprobe or os.getenv('RETRIEVAL_NPROBE', 8))
+
+        self._lock = threading.Lock()
+        self._index = None
+        self._stamp = None
+        self._checked_at = 0.0
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _current(self):
+        """Index chargé, rechargé au plus toutes les 5 s si une ingestion l'a remplacé"""
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < 5:
+            return self._index
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.manifest_path)
+                stamp = (stat.st_ino, stat.st_mtime_ns)
+            except OSError:
+                self._index, self._stamp = None, None
+                return None
+            if stamp != self._stamp:
+                manifest = self._read_manifest()
+                self._index = _Index(self.directory, manifest) if manifest else None
+                self._stamp = stamp
+            return self._index
+
+    def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH):
+            vectors.extend(backend_pool.embed(self.model, texts[start:start + EMBED_BATCH]))
+        return normalize(np.asarray(vectors, dtype=np.float32))
+
+    def search(self, query, k=None):
+        """Renvoie [(passage, score)] par similarité cosinus décroissante"""
+        index = self._current()
+        if index is None:
+            return []
+        start = time.perf_counter()
+        vector = self.embed([query])[0]
+        hits = index.search(vector, k or self.top_k, self.nprobe)
+        metrics.retrieval_latency.observe(time.perf_counter() - start)
+        return hits
+
+    def context_for(self, message):
+        """Passages pertinents à ajouter au message système, ou chaîne vide"""
+        if not self.enabled:
+            return ''
+        try:
+            hits = self.search(message)
+        except Exception as e:
+            # La recherche ne doit jamais empêcher de répondre
+            logger.warning(f'Erreur recherche base de connaissances: {str(e)}')
+            return ''
+
+        lines, used = [], 0
+        for chunk, score in hits:
+            tokens = estimate_tokens(chunk['text'])
+            if score < self.min_score or used + tokens > self.max_tokens:
+                break
+            lines.append(f"- {chunk['text']}")
+            used += tokens
+        if not lines:
+            return ''
+        return "Extraits de la base de connaissances (à utiliser s'ils sont pertinents) :\n" + '\n'.join(lines)
+
+    def ingest(self, source=None):
+        """(Ré)indexe les documents ; seuls les passages modifiés sont revectorisés"""
+        source = source or self.source
+        os.makedirs(self.directory, exist_ok=True)
+
+        previous = self._read_manifest()
+        if previous and previous['model'] != self.model:
+            previous = None
+        old_rows = {}
+        old_vectors = None
+        if previous and previous['chunks']:
+            old_rows = {chunk['hash']: row for row, chunk in enumerate(previous['chunks'])}
+            old_vectors = _Index(self.directory, previous).vectors
+
+        chunks = []
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if not name.endswith(EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                with open(path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                for position, chunk in enumerate(chunk_text(text, self.chunk_tokens)):
+                    chunks.append({
+                        'document': os.path.relpath(path, source),
+                        'position': position,
+                        'text': chunk,
+                        'hash': hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+                    })
+
+        missing = list(dict.fromkeys(c['hash'] for c in chunks if c['hash'] not in old_rows))
+        texts = {c['hash']: c['text'] for c in chunks}
+        embedded = dict(zip(missing, self.embed([texts[h] for h in missing]))) if missing else {}
+
+        if embedded:
+            dim = len(next(iter(embedded.values())))
+        elif previous:
+            dim = previous['dim']
+        else:
+            dim = 0
+
+        # Nouveaux fichiers à chaque ingestion : l'ancien index reste lisible
+        version = uuid.uuid4().hex[:12]
+        manifest = {'version': version, 'model': self.model, 'dim': dim, 'chunks': chunks, 'clusters': 0}
+        if chunks:
+            vectors = np.memmap(
+                os.path.join(self.directory, f'vectors.{version}.f32'),
+                dtype=np.float32, mode='w+', shape=(len(chunks), dim)
+            )
+            for row, chunk in enumerate(chunks):
+                if chunk['hash'] in embedded:
+                    vectors[row] = embedded[chunk['hash']]
+                else:
+                    vectors[row] = old_vectors[old_rows[chunk['hash']]]
+            vectors.flush()
+
+            if len(chunks) >= self.ivf_min:
+                centroids, assignments = kmeans(vectors, int(len(chunks) ** 0.5))
+                np.save(os.path.join(self.directory, f'centroids.{version}.npy'), centroids)
+                np.save(os.path.join(self.directory, f'assignments.{version}.npy'), assignments)
+                manifest['clusters'] = len(centroids)
+            del vectors
+
+        # Publication atomique : les workers voient l'ancien ou le nouvel index
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+        self._remove_old_versions(version)
+
+        return {
+            'documents': len({c['document'] for c in chunks}),
+            'chunks': len(chunks),
+            'embedded': len(missing),
+            'reused': len(chunks) - sum(1 for c in chunks if c['hash'] in embedded),
+            'clusters': manifest['clusters']
+        }
+
+    def _remove_old_versions(self, version):
+        # Un worker qui mappe encore l'ancien fichier le garde lisible après suppression
+        for name in os.listdir(self.directory):
+            if name.split('.')[0] in ('vectors', 'centroids', 'assignments') and f'.{version}.' not in name:
+                os.unlink(os.path.join(self.directory, name))
+
+
+# Base partagée par les routes du chat
+knowledge_base = instrument(KnowledgeBase(), 'retrieval', ('context_for',))
+
+
+if __name__ == '__main__':
+    if np is None:
+        sys.exit('NumPy est requis : pip install numpy')
+    if len(sys.argv) < 2 or sys.argv[1] not in ('ingest', 'search'):
+        sys.exit(__doc__)
+
+    kb = KnowledgeBase(enabled=True)
+    if sys.argv[1] == 'ingest':
+        print(json.dumps(kb.ingest(sys.argv[2] if len(sys.argv) > 2 else None), indent=2))
+    else:
+        for chunk, score in kb.search(' '.join(sys.argv[2:])):
+            print(f"{score:.3f}  {chunk['document']}#{chunk['position']}  {chunk['text'][:100]}")
@@ -0,0 +1,134 @@
+import os
+import re
+from dotenv import load_dotenv
+
+import metrics
+from db.database import estimate_tokens
+from model_catalog import model_catalog
+
+# Load environment variables
+load_dotenv()
+
+AUTO = 'auto'
+DEFAULT_TIERS = 'small:phi,medium:mistral,large:llama3'
+
+# Indices de code : blocs Markdown, mots-clés et ponctuation typique
+CODE_PATTERN = re.compile(
+    r'```|^\s*(def|class|import|from|function|const|let|var|public|#include|SELECT|CREATE)\b'
+    r'|[{};]\s*$|=>|\)\s*\{|</?[a-z]+>',
+    re.MULTILINE | re.IGNORECASE
+)
+LYRICS_WORDS = re.compile(
+    r'\b(paroles|couplet|refrain|rimes?|chanson|lyrics|verse|chorus|rap|punchline)\b', re.IGNORECASE)
+
+FRENCH_WORDS = {'le', 'la', 'les', 'un', 'une', 'des', 'et', 'est', 'je', 'tu', 'vous',
+                'pour', 'avec', 'que', 'qui', 'pas', 'sur', 'dans', 'bonjour', 'merci', 'comment'}
+ENGLISH_WORDS = {'the', 'a', 'an', 'and', 'is', 'are', 'i', 'you', 'for', 'with', 'that',
+                 'what', 'not', 'on', 'in', 'hello', 'thanks', 'how', 'can', 'please'}
+
+
+def parse_tiers(value):
+    """Liste ordonnée (palier, modèle) depuis 'small:phi,medium:mistral,...'"""
+    tiers = []
+    for item in value.split(','):
+        tier, _, model = item.strip().partition(':')
+        if tier and model:
+            tiers.append((tier.strip(), model.strip()))
+    return tiers
+
+
+def detect_language(text):
+    """Langue approximative : 'fr', 'en' ou 'other' (alphabet non latin, inconnue)"""
+    letters = [c for c in text if c.isalpha()]
+    if letters and sum(1 for c in letters if ord(c) > 0x24F) / len(letters) > 0.3:
+        return 'other'
+    words = re.findall(r"[a-zà-ÿ']+", text.lower())
+    french = sum(1 for w in words if w in FRENCH_WORDS)
+    english = sum(1 for w in words if w in ENGLISH_WORDS)
+    if not french and not english:
+        return 'fr' if len(words) <= 3 else 'other'
+    return 'fr' if french >= english else 'en'
+
+
+def looks_like_lyrics(text):
+    if LYRICS_WORDS.search(text):
+        return True
+    # Beaucoup de lignes courtes, dont certaines répétées : un texte de chanson
+    lines = [line.strip().lower() for line in text.splitlines() if line.strip()]
+    return len(lines) >= 6 and sum(len(line) for line in lines) / len(lines) < 50 \
+        and len(set(lines)) < len(lines)
+
+
+class ModelRouter:
+    """Choisit un modèle pour le mode "auto" selon la complexité du message
+
+    Règles locales et bon marché (longueur, langue, code, paroles, profondeur
+    de la conversation) ; le palier le plus élevé déclenché l'emporte.
+    """
+
+    def __init__(self, tiers=None, short_tokens=None, long_tokens=None, deep_turns=None,
+                 languages=None, code_tier=None, lyrics_tier=None, language_tier=None):
+        # Variable vide : paliers par défaut
+        self.tiers = parse_tiers(tiers or os.getenv('MODEL_ROUTER_TIERS') or DEFAULT_TIERS)
+        if not self.tiers:
+            raise ValueError(f'MODEL_ROUTER_TIERS invalide: {tiers or os.getenv("MODEL_ROUTER_TIERS")!r}')
+        self.order = [tier for tier, _ in self.tiers]
+        self.short_tokens = int(short_tokens or os.getenv('MODEL_ROUTER_SHORT_TOKENS', 20))
+        self.long_tokens = int(long_tokens or os.getenv('MODEL_ROUTER_LONG_TOKENS', 400))
+        self.deep_turns = int(deep_turns or os.getenv('MODEL_ROUTER_DEEP_TURNS', 10))
+        # Langues bien servies par le petit modèle
+        self.languages = set((languages or os.getenv('MODEL_ROUTER_SMALL_LANGUAGES', 'fr,en')).split(','))
+        self.code_tier = code_tier or os.getenv('MODEL_ROUTER_CODE_TIER', 'large')
+        self.lyrics_tier = lyrics_tier or os.getenv('MODEL_ROUTER_LYRICS_TIER', 'medium')
+        self.language_tier = language_tier or os.getenv('MODEL_ROUTER_LANGUAGE_TIER', 'medium')
+
+    def classify(self, message, depth=0):
+        """Renvoie (palier, raisons) pour un message et la taille de l'historique"""
+        tokens = estimate_tokens(message)
+        if tokens <= self.short_tokens:
+            rules = [('short', self.order[0])]
+        else:
+            rules = [('default', self.order[len(self.order) // 2])]
+        if tokens >= self.long_tokens:
+            rules.append(('long', self.order[-1]))
+        if depth >= self.deep_turns:
+            rules.append(('deep', self.order[-1]))
+        if CODE_PATTERN.search(message):
+            rules.append(('code', self.code_tier))
+        if looks_like_lyrics(message):
+            rules.append(('lyrics', self.lyrics_tier))
+        if detect_language(message) not in self.languages:
+            rules.append(('language', self.language_tier))
+
+        rank = max(self._rank(tier) for _, tier in rules)
+        tier = self.order[rank]
+        return tier, [reason for reason, t in rules if self._rank(t) == rank]
+
+    def _rank(self, tier):
+        # Palier inconnu de la configuration : le plus proche par défaut
+        if tier in self.order:
+            return self.order.index(tier)
+        return min(1, len(self.order) - 1)
+
+    def route(self, message, depth=0):
+        """Choisit le modèle ; renvoie (modèle, palier, raisons)"""
+        tier, reasons = self.classify(message, depth)
+        model = self._installed_model(tier)
+        metrics.model_routes.inc(tier=tier, reason=reasons[0])
+        return model, tier, reasons
+
+    def _installed_model(self, tier):
+        """Modèle du palier, ou du palier installé le plus proche au-dessus puis en dessous"""
+        models = dict(self.tiers)
+        installed, _, _ = model_catalog.get()
+        names = {m['name'] for m in installed}
+        if not names:
+            return models[tier]
+
+        rank = self.order.index(tier)
+        candidates = self.order[rank:] + self.order[:rank][::-1]
+        return next((models[t] for t in candidates if models[t].replace(':latest', '') in names), models[tier])
+
+
+# Routeur partagé par les routes du chat
+model_router = ModelRouter()
@@ -3,38 +3,35 @@
 import os
 import logging
 from logging.handlers import RotatingFileHandler
-import subprocess
-from flask import Flask
-from server import app
+from concurrent.futures import ThreadPoolExecutor
+from server import app, start_background_services
 from db.database import db
-
-def check_requirements():
-    """Vérifie les dépendances nécessaires"""
-    try:
-        # Vérifier PostgreSQL
-        import psycopg2
-    except ImportError:
-        print("Erreur: psycopg2 n'est pas installé. Installez-le avec:")
-        print("apt install python3-psycopg2")
-        return False
-
-    try:
-        # Vérifier Flask
-        import flask
-    except ImportError:
-        print("Erreur: Flask n'est pas installé. Installez-le avec:")
-        print("apt install python3-flask")
-        return False
-
-    # Vérifier Ollama
-    try:
-        result = subprocess.run(['ollama', 'list'], capture_output=True, text=True)
-        if result.returncode != 0:
-            raise Exception()
-    except:
-        print("Erreur: Ollama n'est pas installé ou n'est pas en cours d'exécution.")
-        print("Installez-le et démarrez-le avant de lancer l'application.")
-        return False
+from backends import backend_pool
+
+def check_ollama():
+    """Vérifie qu'au moins un nœud Ollama répond (/api/tags)"""
+    backend_pool.check_all()
+    return any(backend['healthy'] for backend in backend_pool.status())
+
+def check_services():
+    """Migre la base et contacte Ollama en parallèle"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        migrations = executor.submit(db.init_db)
+        ollama = executor.submit(check_ollama)
+
+        try:
+            applied = migrations.result()
+            if applied:
+                app.logger.info(f'Migrations appliquées: {applied}')
+        except Exception as e:
+            print(f"Erreur d'initialisation de la base de données: {str(e)}")
+            app.logger.error(f'Erreur d\'initialisation de la base de données: {str(e)}')
+            return False
+
+        # Ollama absent n'empêche pas le démarrage : les nœuds sont resondés en continu
+        if not ollama.result():
+            print("Attention: aucun nœud Ollama ne répond pour le moment.")
+            app.logger.warning('Aucun nœud Ollama disponible au démarrage')
 
     return True
 
@@ -66,23 +63,19 @@ def init_app():
         SESSION_COOKIE_SAMESITE='Lax'
     )
 
-    # Initialisation de la base de données
-    try:
-        db.init_db()
-        app.logger.info('Base de données initialisée')
-    except Exception as e:
-        app.logger.error(f'Erreur d\'initialisation de la base de données: {str(e)}')
+    # Migrations et vérification d'Ollama
+    if not check_services():
         return False
+    app.logger.info('Base de données initialisée')
+
+    # Préchargement des modèles dans Ollama
+    start_background_services()
 
     return True
 
 if __name__ == '__main__':
     print("Démarrage de l'application...")
 
-    # Vérifier les prérequis
-    if not check_requirements():
-        exit(1)
-
     # Configuration des logs
     setup_logging()
 
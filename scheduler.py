@@ -0,0 +1,198 @@
+import os
+import heapq
+import itertools
+import threading
+import time
+from dotenv import load_dotenv
+
+from timing import instrument
+
+# Load environment variables
+load_dotenv()
+
+# Priorités : plus petit = servi en premier
+PRIORITY_ADMIN = 0
+PRIORITY_USER = 1
+# Lots hors ligne : ne passent qu'après le trafic interactif
+PRIORITY_BATCH = 2
+
+
+class QueueFull(Exception):
+    """File d'attente du modèle pleine : la requête est refusée immédiatement"""
+
+    def __init__(self, model, retry_after):
+        super().__init__(f'File d\'attente pleine pour {model}')
+        self.model = model
+        self.retry_after = retry_after
+
+
+class QueueTimeout(Exception):
+    """Aucune place libérée pendant le délai d'attente maximal"""
+
+    def __init__(self, model, retry_after):
+        super().__init__(f'Délai d\'attente dépassé pour {model}')
+        self.model = model
+        self.retry_after = retry_after
+
+
+class Slot:
+    """Place de génération obtenue auprès du scheduler"""
+
+    def __init__(self, scheduler, model, position, wait_time):
+        self._scheduler = scheduler
+        self._released = False
+        self.model = model
+        self.position = position
+        self.wait_time = wait_time
+        self.started_at = time.monotonic()
+
+    def release(self):
+        # Idempotent : le flux et la route peuvent tous deux libérer la place
+        if not self._released:
+            self._released = True
+            self._scheduler._release(self.model, time.monotonic() - self.started_at)
+
+    def headers(self):
+        return {
+            'X-Queue-Position': str(self.position),
+            'X-Queue-Wait': f'{self.wait_time:.3f}'
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _ModelQueue:
+    def __init__(self, limit):
+        self.limit = limit
+        self.running = 0
+        self.waiting = []
+        # Durée moyenne d'une génération (moyenne mobile exponentielle)
+        self.avg_duration = 10.0
+
+
+class ModelScheduler:
+    """Limite le nombre de générations simultanées par modèle
+
+    Au-delà de la limite, les requêtes attendent dans une file bornée,
+    ordonnée par priorité puis par ordre d'arrivée.
+
+    Sous gunicorn, chaque worker (SERVER_WORKERS, fixé par serve.py) a son
+    propre scheduler et reçoit limite // workers places, au moins une : une
+    limite inférieure au nombre de workers est donc dépassée (overcommitted).
+    La file d'attente et ses refus sont propres à chaque processus.
+    """
+
+    def __init__(self, default_limit=None, limits=None, queue_size=None, queue_timeout=None, workers=None):
+        self.workers = int(workers or os.getenv('SERVER_WORKERS') or 1)
+        # Limites configurées pour tout le serveur, puis part de ce processus
+        self.configured_default = int(default_limit or os.getenv('OLLAMA_MAX_CONCURRENCY', 2))
+        self.configured_limits = limits if limits is not None \
+            else parse_limits(os.getenv('OLLAMA_MODEL_CONCURRENCY', ''))
+        self.default_limit = worker_share(self.configured_default, self.workers)
+        self.limits = {model: worker_share(limit, self.workers) for model, limit in self.configured_limits.items()}
+        self.queue_size = int(queue_size or os.getenv('OLLAMA_QUEUE_SIZE', 10))
+        self.queue_timeout = float(queue_timeout or os.getenv('OLLAMA_QUEUE_TIMEOUT', 60))
+
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._counter = itertools.count()
+
+    def _queue(self, model):
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = _ModelQueue(self.limits.get(model, self.default_limit))
+            self._queues[model] = queue
+        return queue
+
+    @staticmethod
+    def _ahead(queue, priority):
+        # Servis avant une nouvelle requête : priorité égale ou supérieure
+        return sum(1 for entry in queue.waiting if entry[0] <= priority)
+
+    def _retry_after(self, queue, priority):
+        # Estimation : temps pour écouler la file devant la requête, toutes les places occupées
+        return max(1, int((self._ahead(queue, priority) + 1) * queue.avg_duration / queue.limit))
+
+    def acquire(self, model, priority=PRIORITY_USER):
+        """Réserve une place de génération pour le modèle, en attendant si besoin"""
+        start = time.monotonic()
+        with self._lock:
+            queue = self._queue(model)
+            if queue.running < queue.limit and not queue.waiting:
+                queue.running += 1
+                return Slot(self, model, 0, 0.0)
+
+            if len(queue.waiting) >= self.queue_size:
+                raise QueueFull(model, self._retry_after(queue, priority))
+
+            waiter = threading.Event()
+            position = self._ahead(queue, priority) + 1
+            heapq.heappush(queue.waiting, (priority, next(self._counter), waiter))
+
+        if not waiter.wait(self.queue_timeout):
+            with self._lock:
+                if not waiter.is_set():
+                    queue.waiting = [entry for entry in queue.waiting if entry[2] is not waiter]
+                    heapq.heapify(queue.waiting)
+                    raise QueueTimeout(model, self._retry_after(queue, priority))
+            # La place a été attribuée juste après l'expiration du délai
+
+        return Slot(self, model, position, time.monotonic() - start)
+
+    def _release(self, model, duration):
+        with self._lock:
+            queue = self._queue(model)
+            queue.avg_duration = 0.8 * queue.avg_duration + 0.2 * duration
+            # Transmet directement la place au premier client en attente
+            if queue.waiting:
+                _, _, waiter = heapq.heappop(queue.waiting)
+                waiter.set()
+            else:
+                queue.running -= 1
+
+    def overcommitted(self):
+        """Limites dépassées faute de pouvoir les partager : {modèle: (limite, maximum réel)}
+
+        '*' désigne la limite par défaut (OLLAMA_MAX_CONCURRENCY).
+        """
+        configured = {'*': self.configured_default, **self.configured_limits}
+        return {
+            model: (limit, worker_share(limit, self.workers) * self.workers)
+            for model, limit in configured.items() if limit < self.workers
+        }
+
+    def status(self):
+        """Instantané de l'occupation des files par modèle"""
+        with self._lock:
+            return {
+                model: {
+                    'limit': queue.limit,
+                    'running': queue.running,
+                    'waiting': len(queue.waiting),
+                    'avg_duration': round(queue.avg_duration, 3)
+                }
+                for model, queue in self._queues.items()
+            }
+
+
+def worker_share(limit, workers):
+    """Places d'un processus parmi workers ; au moins une, même si limit < workers"""
+    return max(1, limit // workers)
+
+
+def parse_limits(value):
+    """Analyse "llama3:1,phi:4" en {'llama3': 1, 'phi': 4}"""
+    limits = {}
+    for item in value.split(','):
+        model, sep, limit = item.strip().rpartition(':')
+        if sep and model and limit.isdigit():
+            limits[model] = int(limit)
+    return limits
+
+
+# Scheduler partagé par les routes du chat
+scheduler = instrument(ModelScheduler(), 'queue', ('acquire',))
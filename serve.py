@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Serveur de production : wsgi.application sous gunicorn
+
+    python3 serve.py                 # démarre le maître et ses workers
+    python3 serve.py --print-config  # affiche la configuration générée
+
+La configuration est calculée à partir du nombre de CPU et de la
+concurrence Ollama, chaque valeur pouvant être imposée par une variable
+GUNICORN_*. L'application est chargée une fois dans le maître (migrations
+comprises) puis partagée par fork ; chaque worker ouvre ensuite son pool de
+connexions et démarre ses threads d'arrière-plan.
+
+SIGHUP recharge sans coupure : configuration et code sont relus par le
+maître, de nouveaux workers démarrent, les anciens finissent leurs requêtes.
+"""
+
+import os
+import sys
+from dotenv import load_dotenv, dotenv_values
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Variables de l'environnement du processus (systemd...) : prioritaires sur .env,
+# y compris quand .env est relu au rechargement
+PROCESS_ENV = set(os.environ)
+
+# Load environment variables
+load_dotenv()
+
+WORKER_CLASS = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if WORKER_CLASS == 'gevent':
+    # Avant tout import de l'application : verrous et sockets coopératifs dans le maître
+    try:
+        from gevent import monkey
+    except ImportError:
+        sys.exit('GUNICORN_WORKER_CLASS=gevent nécessite le paquet gevent (pip install gevent)')
+    monkey.patch_all()
+
+from gunicorn.app.base import BaseApplication  # noqa: E402
+
+# L'application démarre ses services après le fork (voir wsgi.py)
+os.environ['WSGI_SERVICES_AFTER_FORK'] = 'True'
+
+
+def ollama_concurrency(workers=1):
+    """Générations simultanées d'un worker : nœuds Ollama × sa part de la concurrence par modèle"""
+    nodes = [n for n in os.getenv('OLLAMA_BACKENDS', '').split(',') if n.strip()] or [None]
+    return len(nodes) * max(1, int(os.getenv('OLLAMA_MAX_CONCURRENCY', 2)) // workers)
+
+
+def generate_config():
+    """Options gunicorn, par défaut déduites de la machine et d'Ollama"""
+    cpus = os.cpu_count() or 1
+    # Un worker par CPU (le temps passé en Python est court, l'attente d'Ollama
+    # longue), mais pas plus que OLLAMA_MAX_CONCURRENCY : chaque worker a son propre
+    # scheduler, qui reçoit limite // workers places par modèle et au moins une.
+    # Avec plus de workers que la limite, celle-ci est dépassée (signalé au démarrage).
+    # File d'attente et refus 429, threads de jobs, nettoyage et surveillance des
+    # nœuds sont eux aussi propres à chaque worker.
+    max_concurrency = int(os.getenv('OLLAMA_MAX_CONCURRENCY', 2))
+    workers = int(os.getenv('GUNICORN_WORKERS') or max(1, min(max(cpus, 2), 8, max_concurrency)))
+    concurrency = ollama_concurrency(workers)
+    # Fixée au démarrage : le monkey-patching de gevent ne se défait pas
+    worker_class = WORKER_CLASS
+
+    config = {
+        'bind': os.getenv('GUNICORN_BIND', f"{os.getenv('FLASK_HOST', '127.0.0.1')}:{os.getenv('FLASK_PORT', 5000)}"),
+        'worker_class': worker_class,
+        'workers': workers,
+        'preload_app': os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true',
+        # Recyclage des workers, décalé pour ne pas les redémarrer tous ensemble
+        'max_requests': int(os.getenv('GUNICORN_MAX_REQUESTS', 1000)),
+        'max_requests_jitter': int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100)),
+        # Un flux de chat peut durer plusieurs minutes
+        'timeout': int(os.getenv('GUNICORN_TIMEOUT', 120)),
+        'graceful_timeout': int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 120)),
+        'keepalive': int(os.getenv('GUNICORN_KEEPALIVE', 5)),
+        'accesslog': os.getenv('GUNICORN_ACCESS_LOG', '-') or None,
+        'errorlog': os.getenv('GUNICORN_ERROR_LOG', '-'),
+        'loglevel': os.getenv('GUNICORN_LOG_LEVEL', 'info'),
+        'proc_name': 'ia-chat',
+        'chdir': ROOT
+    }
+    if worker_class == 'gthread':
+        # Chaque génération et chaque requête en file tient un thread ; quelques
+        # threads de plus pour les routes rapides
+        config['threads'] = int(
+            os.getenv('GUNICORN_THREADS') or concurrency + int(os.getenv('OLLAMA_QUEUE_SIZE', 10)) + 4)
+    elif worker_class == 'gevent':
+        config['worker_connections'] = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+    return config
+
+
+# Hooks gunicorn
+
+def when_ready(server):
+    server.log.info(f'Prêt : {server.num_workers} workers ({server.cfg.worker_class_str})')
+    from scheduler import scheduler
+    for model, (limit, effective) in scheduler.overcommitted().items():
+        server.log.warning(
+            f'Concurrence Ollama {model}: limite {limit} inférieure au nombre de workers, '
+            f'jusqu\'à {effective} générations simultanées')
+
+
+def post_worker_init(worker):
+    """Dans chaque worker, après le fork : pool de connexions et services"""
+    from db.database import db
+    from server import start_background_services
+    try:
+        db.open_pool()
+    except Exception as e:
+        # La base n'est pas indispensable au démarrage : le pool s'ouvrira à la première requête
+        worker.log.warning(f'Pool de connexions non ouvert: {str(e)}')
+    start_background_services()
+
+
+def worker_exit(server, worker):
+    from db.database import db
+    from jobs import job_runner
+    job_runner.stop()
+    db.close_pool()
+
+
+def on_reload(server):
+    server.log.info('Rechargement : nouveaux workers, arrêt progressif des anciens')
+
+
+HOOKS = {
+    'when_ready': when_ready,
+    'post_worker_init': post_worker_init,
+    'worker_exit': worker_exit,
+    'on_reload': on_reload
+}
+
+
+class ChatApplication(BaseApplication):
+    """Application gunicorn configurée par generate_config()"""
+
+    def load_config(self):
+        # Un rechargement (SIGHUP) relit aussi le fichier .env
+        for key, value in dotenv_values(os.path.join(ROOT, '.env')).items():
+            if key not in PROCESS_ENV and value is not None:
+                os.environ[key] = value
+        config = generate_config()
+        # Avant le chargement de l'application : le scheduler partage ses limites
+        # entre les workers, les pools de connexions suivent le nombre de threads
+        os.environ['SERVER_WORKERS'] = str(config['workers'])
+        os.environ['SERVER_THREADS'] = str(config.get('threads') or config.get('worker_connections') or 1)
+        for key, value in {**config, **HOOKS}.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from wsgi import application
+        from db.database import db
+        # Connexions des migrations fermées avant le fork : aucun worker ne les hérite
+        db.close_pool()
+        return application
+
+    def reload(self):
+        super().reload()
+        if not self.cfg.preload_app:
+            return
+        # Code préchargé : les modules du projet sont réimportés pour les nouveaux workers
+        saved = dict(sys.modules)
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, '__file__', None) or ''
+            if name != '__main__' and path.startswith(ROOT + os.sep) and 'site-packages' not in path:
+                del sys.modules[name]
+        try:
+            self.callable = self.load()
+        except Exception as e:
+            sys.modules.update(saved)
+            print(f'Rechargement du code impossible, ancienne version conservée: {str(e)}', file=sys.stderr)
+
+
+def print_config():
+    for key, value in generate_config().items():
+        print(f'{key} = {value!r}')
+
+
+if __name__ == '__main__':
+    if '--print-config' in sys.argv[1:]:
+        print_config()
+    else:
+        ChatApplication().run()
@@ -1,20 +1,112 @@
-from flask import Flask, request, jsonify, session, send_from_directory
+from flask import Flask, Response, g, request, jsonify, session, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from functools import wraps
-from db.database import db
+from db.database import db, estimate_tokens
+from ollama_client import OllamaError
+from backends import backend_pool
+from response_cache import response_cache
+from model_manager import model_manager
+from model_catalog import model_catalog, EMPTY
+from router import model_router, AUTO
+from retrieval import knowledge_base
+import metrics
+from credentials import CredentialsBusy
+from assets import static_assets
+from scheduler import scheduler, QueueFull, QueueTimeout, PRIORITY_ADMIN, PRIORITY_USER, PRIORITY_BATCH
+import batch
+from jobs import job_runner, describe as describe_job, FINAL_STATES
+from quotas import quota_manager, quota_headers, parse_limits, format_limits, QuotaExceeded
+from timing import request_tracer, span
+from compression import response_compressor
 import requests
-import json
+import json_codec
 import os
-from cachetools import TTLCache
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON de Flask (jsonify, request.json) via json_codec, mesuré dans Server-Timing"""
+
+    # L'ordre des clés ne fait pas partie de l'API : pas de tri
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        with span('json'):
+            # indent (mode debug) : sortie lisible par le module json
+            if 'indent' in kwargs:
+                return super().dumps(obj, **kwargs)
+            return json_codec.dumps(obj, default=self.default)
+
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'votre_clé_secrète_ici')
 
-# Cache pour les modèles (validité 1 heure)
-models_cache = TTLCache(maxsize=100, ttl=3600)
+# Budget de tokens du contexte envoyé au modèle (message système compris)
+CHAT_CONTEXT_TOKENS = int(os.getenv('CHAT_CONTEXT_TOKENS', 2048))
+
+# Champs de la réponse du chat utilisés par le client ("verbose": true pour tout recevoir)
+CHAT_RESPONSE_FIELDS = ('model', 'message', 'done', 'done_reason', 'eval_count', 'eval_duration')
+
+# Métriques exposées sur /metrics
+metrics.registry.gauge(
+    'response_cache_hit_ratio', 'Taux de succès du cache des réponses',
+    callback=lambda: {(): response_cache.stats()['hit_ratio']})
+metrics.registry.gauge(
+    'scheduler_waiting', 'Requêtes en attente par modèle', ('model',),
+    callback=lambda: {(model,): state['waiting'] for model, state in scheduler.status().items()})
+metrics.registry.gauge(
+    'scheduler_running', 'Générations en cours par modèle', ('model',),
+    callback=lambda: {(model,): state['running'] for model, state in scheduler.status().items()})
+metrics.registry.gauge(
+    'models_catalog_age_seconds', 'Âge de la liste des modèles servie',
+    callback=lambda: {(): model_catalog.status()['age'] or 0})
+
+for stat in ('size', 'in_use', 'waiters'):
+    metrics.registry.gauge(
+        f'db_pool_{stat}', f'Pool MySQL : {stat}',
+        callback=lambda stat=stat: {(): (db.pool_stats() or {}).get(stat, 0)})
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    g.request_timer = request_tracer.start(
+        request.url_rule.rule if request.url_rule else 'unmatched', request.method)
+
+@app.after_request
+def record_request(response):
+    if 'request_start' in g:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.http_latency.observe(time.perf_counter() - g.request_start, route=route, method=request.method)
+        metrics.http_requests.inc(route=route, method=request.method, status=response.status_code)
+    response = response_compressor.compress(response)
+    timer = g.get('request_timer')
+    if timer:
+        timer.status = response.status_code
+        # Session lue seulement si la route l'a déjà ouverte : pas de Vary: Cookie sur les fichiers statiques
+        if request_tracer.show_header(session.accessed and session.get('is_admin', False)):
+            response.headers['Server-Timing'] = timer.server_timing()
+    return response
+
+@app.teardown_request
+def finish_timer(error=None):
+    # Avec stream_with_context, appelé à la fin du flux : la génération est comptée
+    timer = g.pop('request_timer', None)
+    if timer:
+        request_tracer.finish(timer)
+    # Conversation créée par la requête mais premier échange jamais enregistré
+    # (erreur Ollama, délai dépassé, flux interrompu) : elle ne reste pas vide
+    conversation_id = g.pop('unsaved_conversation', None)
+    if conversation_id:
+        try:
+            db.discard_conversation(conversation_id)
+        except Exception as e:
+            app.logger.error(f'Erreur suppression conversation {conversation_id}: {str(e)}')
 
 def login_required(f):
     @wraps(f)
@@ -26,11 +118,18 @@ def login_required(f):
 
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return static_assets.serve('index.html')
 
 @app.route('/<path:path>')
 def static_files(path):
-    return send_from_directory('.', path)
+    return static_assets.serve(path)
+
+@app.route('/metrics')
+def get_metrics():
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Non autorisé'}), 401
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 # Routes d'authentification
 @app.route('/api/auth/login', methods=['POST'])
@@ -55,6 +154,8 @@ def login():
             })
 
         return jsonify({'error': 'Identifiants invalides'}), 401
+    except CredentialsBusy:
+        return jsonify({'error': 'Trop de connexions en cours, réessayez'}), 503, {'Retry-After': '1'}
     except Exception as e:
         app.logger.error(f'Erreur de login: {str(e)}')
         return jsonify({'error': 'Erreur de connexion'}), 500
@@ -103,32 +204,39 @@ def update_preferences():
 @app.route('/api/models', methods=['GET'])
 @login_required
 def get_models():
-    try:
-        # Vérifier le cache
-        if 'models' in models_cache:
-            return jsonify(models_cache['models'])
-
-        response = requests.get('http://localhost:11434/api/tags', timeout=5)
-
-        if response.status_code != 200:
-            raise Exception('Erreur Ollama list')
+    # Jamais d'appel à Ollama ici : le catalogue se rafraîchit en arrière-plan
+    models, state, age = model_catalog.get()
+    metrics.models_cache_requests.inc(result=state)
+    if state == EMPTY:
+        response = jsonify({'error': 'Liste des modèles en cours de chargement'})
+        response.headers['Retry-After'] = '2'
+        return response, 503
+
+    response = jsonify(mark_loaded(models))
+    response.headers['Age'] = str(int(age))
+    response.headers['X-Models-State'] = state
+    return response
+
+def mark_loaded(models):
+    """Indique les modèles déjà en mémoire d'Ollama (réponse immédiate)"""
+    return [{**model, 'loaded': model_manager.is_loaded(model['name'])} for model in models]
+
+@app.route('/api/models/loaded', methods=['GET'])
+@login_required
+def get_loaded_models():
+    return jsonify(model_manager.loaded_models())
 
-        models = []
-        for model in response.json()['models']:
-            name = model['name'].replace(':latest', '')
-            models.append({
-                'name': name,
-                'size': f"{model['size']/(1024*1024*1024):.1f} GB"
-            })
+@app.route('/api/backends', methods=['GET'])
+@login_required
+def get_backends():
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Accès non autorisé'}), 403
+    return jsonify(backend_pool.status())
 
-        # Mettre en cache
-        models_cache['models'] = models
-        return jsonify(models)
-    except requests.Timeout:
-        return jsonify({'error': 'Temps de réponse dépassé'}), 504
-    except Exception as e:
-        app.logger.error(f'Erreur get_models: {str(e)}')
-        return jsonify({'error': str(e)}), 500
+@app.route('/api/queue', methods=['GET'])
+@login_required
+def get_queue():
+    return jsonify(scheduler.status())
 
 # Route d'inscription publique
 @app.route('/api/auth/register', methods=['POST'])
@@ -141,20 +249,21 @@ def register():
         if not username or not password:
             return jsonify({'error': 'Identifiants requis'}), 400
 
-        success = db.create_user(
+        user_id = db.create_user(
             username=username,
             password=password,
             is_admin=False
         )
 
-        if success:
-            user = db.verify_user(username, password)
-            if user:
-                session['user_id'] = user[0]
-                session['is_admin'] = user[1]
-                return jsonify({'success': True})
+        if user_id:
+            # La session est ouverte sans revérifier le mot de passe
+            session['user_id'] = user_id
+            session['is_admin'] = False
+            return jsonify({'success': True})
 
         return jsonify({'error': 'Nom d\'utilisateur déjà pris'}), 400
+    except CredentialsBusy:
+        return jsonify({'error': 'Trop d\'inscriptions en cours, réessayez'}), 503, {'Retry-After': '1'}
     except Exception as e:
         app.logger.error(f'Erreur register: {str(e)}')
         return jsonify({'error': 'Erreur d\'inscription'}), 500
@@ -162,51 +271,429 @@ def register():
 @app.route('/api/chat', methods=['POST'])
 @login_required
 def chat():
+    data = request.get_json(silent=True)
+    # Corps vérifié avant le quota : une requête invalide n'est pas décomptée
+    error = chat_body_error(data)
+    if error:
+        return jsonify({'error': error}), 400
     try:
-        data = request.json
-        user_id = session['user_id']
-
-        # Get user preferences
-        user_prefs = db.get_user_preferences(user_id)
-
-        # Construct system message
-        system_msg = user_prefs.get('system_message', '')
-        if user_prefs.get('interests'):
-            system_msg += f"\nCentres d'intérêt de l'utilisateur: {', '.join(user_prefs['interests'])}"
+        user_id, is_admin = session['user_id'], session.get('is_admin', False)
+        quota = quota_manager.check(user_id, is_admin)
+        try:
+            messages, new_turns, conversation_id, model, route = prepare_chat(data, session['user_id'])
+        except ConversationNotFound as e:
+            return conversation_not_found(e, user_id, is_admin, quota)
+        if new_turns and not data.get('conversation_id'):
+            g.unsaved_conversation = conversation_id
+
+        # Cache des réponses identiques
+        cache_key = None
+        cached = None
+        if response_cache.enabled_for(model):
+            cache_key = response_cache.key(model, messages)
+            cached = response_cache.get(cache_key)
+
+        def on_complete(result):
+            if not cached:
+                metrics.observe_ollama(result)
+                quota_manager.charge(user_id, is_admin, result)
+            if cache_key and not cached:
+                response_cache.set(cache_key, {k: v for k, v in result.items() if k != 'context'})
+            if new_turns:
+                save_turns(conversation_id, new_turns, result['message']['content'])
+                g.pop('unsaved_conversation', None)
+
+        headers = {'X-Cache': cache_status(cache_key, cached), **quota_headers(quota)}
+        if route:
+            headers.update({'X-Model': model, 'X-Model-Tier': route['tier']})
+        keep_alive = model_manager.record_use(model)
+        priority = PRIORITY_ADMIN if is_admin else PRIORITY_USER
+
+        if data.get('stream'):
+            slot = None
+            if cached:
+                generator = replay_cached_stream(cached, on_complete, conversation_id)
+            else:
+                # La place est conservée jusqu'à la fin du flux
+                slot = scheduler.acquire(model, priority)
+                try:
+                    chunks = backend_pool.chat_stream(model, messages, keep_alive=keep_alive)
+                except Exception:
+                    slot.release()
+                    raise
+                generator = relay_chat_stream(chunks, on_complete, conversation_id)
+                headers.update(slot.headers())
+
+            response = Response(
+                stream_with_context(generator),
+                mimetype='application/x-ndjson',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', **headers}
+            )
+            if slot:
+                response.call_on_close(chunks.close)
+                response.call_on_close(slot.release)
+            return response
+
+        if cached:
+            result = dict(cached)
+        else:
+            with scheduler.acquire(model, priority) as slot:
+                result = backend_pool.chat(model, messages, keep_alive=keep_alive)
+            headers.update(slot.headers())
+        on_complete(result)
+        if not data.get('verbose'):
+            result = {k: result[k] for k in CHAT_RESPONSE_FIELDS if k in result}
+        if new_turns:
+            result['conversation_id'] = conversation_id
+        if route:
+            result['route'] = route
+        return jsonify(result), 200, headers
+    except QuotaExceeded as e:
+        return quota_exceeded(e)
+    except QueueFull as e:
+        return jsonify({'error': 'Trop de requêtes en attente, réessayez plus tard'}), 429, {'Retry-After': str(e.retry_after)}
+    except QueueTimeout as e:
+        return jsonify({'error': 'Modèle occupé, réessayez plus tard'}), 503, {'Retry-After': str(e.retry_after)}
+    except requests.Timeout:
+        return jsonify({'error': 'Temps de réponse dépassé'}), 504
+    except OllamaError as e:
+        app.logger.error(f'Erreur chat: {str(e)}')
+        return jsonify({'error': str(e)}), 502
+    except Exception as e:
+        app.logger.error(f'Erreur chat: {str(e)}')
+        return jsonify({'error': str(e)}), 500
 
-        # Prepare messages with context
+def quota_exceeded(error):
+    """Réponse 429 d'un quota dépassé, avec l'état des seaux"""
+    return jsonify({'error': f'{error}, réessayez dans {error.retry_after} s'}), 429, \
+        quota_headers(error.state, error.retry_after)
+
+class ConversationNotFound(Exception):
+    """Conversation inexistante ou appartenant à un autre utilisateur"""
+
+def conversation_not_found(error, user_id, is_admin, quota):
+    """Réponse 404, la requête décomptée étant rendue au quota"""
+    quota = quota_manager.refund(user_id, is_admin, quota)
+    return jsonify({'error': str(error)}), 404, quota_headers(quota)
+
+def prepare_chat(data, user_id):
+    """Construit les messages envoyés au modèle et choisit le modèle
+
+    Renvoie (messages, nouveaux tours, conversation_id, modèle, routage) ;
+    ConversationNotFound si la conversation n'appartient pas à l'utilisateur.
+    """
+    # Get user preferences and system message (cached)
+    user_prefs = db.get_user_preferences(user_id)
+    query = data['message'] if 'message' in data else (data['messages'] or [{}])[-1].get('content', '')
+    system_msg = with_knowledge(db.get_system_prompt(user_id), query)
+
+    # Prepare messages with context
+    conversation_id = data.get('conversation_id')
+    new_turns = []
+    if 'message' in data:
+        # Mode conversation : l'historique est reconstruit côté serveur
+        new_turns = [{'role': 'user', 'content': data['message']}]
+        history = []
+        if conversation_id:
+            budget = CHAT_CONTEXT_TOKENS - estimate_tokens(system_msg) - estimate_tokens(data['message'])
+            history = db.get_context_messages(conversation_id, user_id, max(budget, 0))
+            if history is None:
+                raise ConversationNotFound('Conversation introuvable')
+        else:
+            conversation_id = db.create_conversation(user_id, data['message'])
+        messages = [{"role": "system", "content": system_msg}, *history, *new_turns]
+    else:
         messages = [
             {"role": "system", "content": system_msg},
             *data['messages']
         ]
 
-        response = requests.post(
-            f"http://{os.getenv('OLLAMA_HOST', 'localhost')}:{os.getenv('OLLAMA_PORT', '11434')}/api/chat",
-            json={
-                'model': data.get('model', user_prefs.get('model', 'phi')),
-                'messages': messages,
-                'stream': False
-            },
-            timeout=int(os.getenv('OLLAMA_TIMEOUT', '30'))
-        )
-
-        if response.status_code != 200:
-            raise Exception('Erreur API Ollama')
+    model = data.get('model', user_prefs.get('model', 'phi'))
+    route = None
+    if model == AUTO:
+        # Mode auto : palier choisi d'après le dernier message et la profondeur
+        last = data['message'] if 'message' in data else messages[-1]['content']
+        model, tier, reasons = model_router.route(last, depth=len(messages) - 2)
+        route = {'model': model, 'tier': tier, 'reasons': reasons}
+    return messages, new_turns, conversation_id, model, route
+
+def with_knowledge(system_msg, query):
+    """Ajoute au message système les passages utiles de la base de connaissances"""
+    knowledge = knowledge_base.context_for(query)
+    return f'{system_msg}\n\n{knowledge}' if knowledge else system_msg
+
+@app.route('/api/chat/batch', methods=['POST'])
+@login_required
+def chat_batch():
+    """Plusieurs prompts indépendants en une requête, résultats en NDJSON
+
+    Corps : {"model": ..., "prompts": ["...", {"message": ..., "model": ...}],
+    "concurrency": 4}. Chaque ligne porte l'index du prompt d'origine.
+    """
+    data = request.json or {}
+    prompts = data.get('prompts')
+    if not isinstance(prompts, list) or not prompts:
+        return jsonify({'error': 'Liste de prompts requise'}), 400
+    if len(prompts) > batch.MAX_ITEMS:
+        return jsonify({'error': f'Au plus {batch.MAX_ITEMS} prompts par lot'}), 400
+
+    # Préférences et message système chargés une seule fois pour tout le lot
+    user_id, is_admin = session['user_id'], session.get('is_admin', False)
+    user_prefs = db.get_user_preferences(user_id)
+    system_msg = db.get_system_prompt(user_id)
+    default_model = data.get('model', user_prefs.get('model', 'phi'))
+    options = data.get('options')
+    try:
+        concurrency = min(max(int(data.get('concurrency', batch.MAX_CONCURRENCY)), 1), batch.MAX_CONCURRENCY)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Concurrence invalide'}), 400
+
+    def run_item(prompt):
+        if isinstance(prompt, str):
+            prompt = {'message': prompt}
+        if not isinstance(prompt, dict) or not isinstance(prompt.get('message'), str):
+            raise ValueError('Prompt invalide')
+        messages = [
+            {'role': 'system', 'content': with_knowledge(system_msg, prompt['message'])},
+            {'role': 'user', 'content': prompt['message']}
+        ]
+        model = prompt.get('model', default_model)
+        if model == AUTO:
+            model, _, _ = model_router.route(prompt['message'])
+        # Chaque élément compte comme une requête du quota
+        quota_manager.check(user_id, is_admin)
+        result = run_batch_item(model, messages, prompt.get('options', options))
+        if not result['cached']:
+            quota_manager.charge(user_id, is_admin, result)
+        return result
+
+    def generate():
+        for index, result, error in batch.fan_out(prompts, run_item, concurrency):
+            if isinstance(error, QuotaExceeded):
+                yield json_codec.dumps({'index': index, 'error': batch_error(error), 'retry_after': error.retry_after}) + '\n'
+            elif error is not None:
+                yield json_codec.dumps({'index': index, 'error': batch_error(error)}) + '\n'
+            else:
+                yield json_codec.dumps({'index': index, **result}) + '\n'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Batch-Size': str(len(prompts))}
+    )
 
-        return jsonify(response.json()), 200
-    except requests.Timeout:
-        return jsonify({'error': 'Temps de réponse dépassé'}), 504
+def run_batch_item(model, messages, options=None):
+    """Un élément de lot : cache, file d'attente basse priorité puis Ollama"""
+    cache_key = response_cache.key(model, messages) if response_cache.enabled_for(model) and not options else None
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached:
+        result = cached
+    else:
+        with scheduler.acquire(model, PRIORITY_BATCH):
+            result = backend_pool.chat(
+                model, messages, options=options, keep_alive=model_manager.record_use(model))
+        metrics.observe_ollama(result)
+        if cache_key:
+            response_cache.set(cache_key, {k: v for k, v in result.items() if k != 'context'})
+    return {
+        'model': result.get('model', model),
+        'message': result['message'],
+        'cached': bool(cached),
+        'eval_count': result.get('eval_count'),
+        'total_duration': result.get('total_duration')
+    }
+
+def batch_error(error):
+    """Message d'erreur d'un élément, sans interrompre le reste du lot"""
+    if isinstance(error, (QueueFull, QueueTimeout)):
+        return 'Modèle occupé, réessayez plus tard'
+    if isinstance(error, requests.Timeout):
+        return 'Temps de réponse dépassé'
+    if isinstance(error, (OllamaError, QuotaExceeded, ValueError)):
+        return str(error)
+    app.logger.error(f'Erreur chat batch: {str(error)}')
+    return 'Erreur interne'
+
+# Mode job : la génération tourne hors des threads web
+JOB_MAX_WAIT = float(os.getenv('JOB_MAX_WAIT', 25))
+
+@app.route('/api/jobs', methods=['POST'])
+@login_required
+def create_job():
+    """Met une requête de chat en file et renvoie l'identifiant du job"""
+    data = request.get_json(silent=True)
+    # Corps vérifié avant le quota : une requête invalide n'est pas décomptée
+    error = chat_body_error(data)
+    if error:
+        return jsonify({'error': error}), 400
+    is_admin = session.get('is_admin', False)
+    try:
+        quota = quota_manager.check(session['user_id'], is_admin)
+        try:
+            messages, new_turns, conversation_id, model, route = prepare_chat(data, session['user_id'])
+        except ConversationNotFound as e:
+            return conversation_not_found(e, session['user_id'], is_admin, quota)
+
+        job_id = job_runner.submit(
+            session['user_id'], model, messages, new_turns, conversation_id,
+            priority=PRIORITY_ADMIN if is_admin else PRIORITY_USER,
+            options=data.get('options'),
+            is_admin=is_admin,
+            new_conversation=bool(new_turns) and not data.get('conversation_id')
+        )
+        body = {'id': job_id, 'status': 'queued', 'model': model, 'conversation_id': conversation_id}
+        if route:
+            body['route'] = route
+        return jsonify(body), 202, {'Location': f'/api/jobs/{job_id}', **quota_headers(quota)}
+    except QuotaExceeded as e:
+        return quota_exceeded(e)
     except Exception as e:
-        app.logger.error(f'Erreur chat: {str(e)}')
+        app.logger.error(f'Erreur job: {str(e)}')
         return jsonify({'error': str(e)}), 500
 
+def chat_body_error(data):
+    """Message d'erreur si le corps n'est pas un chat valide, sinon None"""
+    if not isinstance(data, dict):
+        return 'Corps JSON requis'
+    if 'message' in data:
+        if not isinstance(data['message'], str) or not data['message'].strip():
+            return 'Message requis'
+    elif not isinstance(data.get('messages'), list) or not data['messages'] \
+            or not all(isinstance(m, dict) and isinstance(m.get('content'), str) for m in data['messages']):
+        return 'Champ message ou messages requis'
+    return None
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """État du job ; ?wait=N attend jusqu'à N secondes sa terminaison"""
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), JOB_MAX_WAIT)
+    except ValueError:
+        return jsonify({'error': 'Paramètre wait invalide'}), 400
+    job = job_runner.wait(job_id, session['user_id'], wait)
+    if job is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+    return jsonify(describe_job(job))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+@login_required
+def job_events(job_id):
+    """Flux NDJSON des changements d'état du job, jusqu'à sa terminaison"""
+    user_id = session['user_id']
+    if db.get_job(job_id, user_id) is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+
+    def generate():
+        status = None
+        while True:
+            job = job_runner.wait(job_id, user_id, JOB_MAX_WAIT)
+            if job is None:
+                yield json_codec.dumps({'id': job_id, 'error': 'Job introuvable'}) + '\n'
+                return
+            if job['status'] != status:
+                status = job['status']
+                yield json_codec.dumps(describe_job(job)) + '\n'
+            else:
+                # Ligne vide : garde la connexion ouverte à travers les proxys
+                yield '\n'
+            if status in FINAL_STATES:
+                return
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+@login_required
+def cancel_job(job_id):
+    if job_runner.cancel(job_id, session['user_id']):
+        return jsonify({'success': True})
+    job = db.get_job(job_id, session['user_id'])
+    if job is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+    return jsonify({'error': 'Job déjà terminé', 'status': job['status']}), 409
+
+def save_turns(conversation_id, new_turns, reply):
+    """Enregistre la question et la réponse en une seule écriture"""
+    if not db.append_messages(conversation_id, [*new_turns, {'role': 'assistant', 'content': reply}]):
+        app.logger.error(f'Erreur enregistrement conversation {conversation_id}')
+
+def cache_status(cache_key, cached):
+    if not cache_key:
+        return 'BYPASS'
+    return 'HIT' if cached else 'MISS'
+
+def final_stream_message(result, conversation_id):
+    """Dernière ligne du flux : statistiques de génération"""
+    return json_codec.dumps({
+        'done': True,
+        'conversation_id': conversation_id,
+        'model': result.get('model'),
+        'total_duration': result.get('total_duration'),
+        'load_duration': result.get('load_duration'),
+        'prompt_eval_count': result.get('prompt_eval_count'),
+        'prompt_eval_duration': result.get('prompt_eval_duration'),
+        'eval_count': result.get('eval_count'),
+        'eval_duration': result.get('eval_duration')
+    }) + '\n'
+
+def relay_chat_stream(chunks, on_complete=None, conversation_id=None):
+    """Relaie les fragments NDJSON d'Ollama au client au fur et à mesure"""
+    reply = []
+    try:
+        for chunk in chunks:
+            if 'error' in chunk:
+                yield json_codec.dumps({'done': True, 'error': chunk['error']}) + '\n'
+                break
+            if chunk.get('done'):
+                if on_complete:
+                    result = dict(chunk)
+                    result['message'] = {'role': 'assistant', 'content': ''.join(reply)}
+                    on_complete(result)
+                yield final_stream_message(chunk, conversation_id)
+                break
+            content = chunk.get('message', {}).get('content', '')
+            reply.append(content)
+            yield json_codec.dumps({
+                'done': False,
+                'message': {'role': 'assistant', 'content': content}
+            }) + '\n'
+    except requests.RequestException as e:
+        app.logger.error(f'Erreur chat stream: {str(e)}')
+        yield json_codec.dumps({'done': True, 'error': 'Temps de réponse dépassé'}) + '\n'
+    finally:
+        chunks.close()
+
+def replay_cached_stream(result, on_complete=None, conversation_id=None):
+    """Rejoue une réponse en cache au format du flux"""
+    yield json_codec.dumps({'done': False, 'message': result['message']}) + '\n'
+    if on_complete:
+        on_complete(result)
+    yield final_stream_message(result, conversation_id)
+
 # Routes des utilisateurs
 @app.route('/api/users', methods=['GET'])
 @login_required
 def get_users():
     if not session.get('is_admin'):
         return jsonify({'error': 'Accès non autorisé'}), 403
-    return jsonify(db.get_users())
+
+    # Pagination par curseur : ?limit=50&cursor=...&search=préfixe&fields=id,username
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        fields = request.args.get('fields')
+        users, next_cursor, total = db.get_users(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            search=request.args.get('search', '').strip() or None,
+            fields=fields.split(',') if fields else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'users': users, 'next_cursor': next_cursor, 'total': total})
 
 @app.route('/api/users', methods=['POST'])
 @login_required
@@ -217,14 +704,23 @@ def create_user():
     data = request.json
     if not data.get('username') or not data.get('password'):
         return jsonify({'error': 'Données manquantes'}), 400
+    try:
+        quota = user_quota(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    success = db.create_user(
-        data['username'],
-        data['password'],
-        data.get('is_admin', False)
-    )
+    try:
+        user_id = db.create_user(
+            data['username'],
+            data['password'],
+            data.get('is_admin', False)
+        )
+    except CredentialsBusy:
+        return jsonify({'error': 'Trop de requêtes en cours, réessayez'}), 503, {'Retry-After': '1'}
 
-    if success:
+    if user_id:
+        if quota:
+            db.set_user_quota(user_id, quota)
         return jsonify({'success': True})
     return jsonify({'error': 'Nom d\'utilisateur déjà pris'}), 400
 
@@ -237,18 +733,32 @@ def update_user(user_id):
     data = request.json
     if not data.get('username'):
         return jsonify({'error': 'Nom d\'utilisateur requis'}), 400
+    try:
+        quota = user_quota(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    success = db.update_user(
-        user_id,
-        data['username'],
-        data.get('password'),
-        data.get('is_admin', False)
-    )
+    try:
+        success = db.update_user(
+            user_id,
+            data['username'],
+            data.get('password'),
+            data.get('is_admin', False)
+        )
+    except CredentialsBusy:
+        return jsonify({'error': 'Trop de requêtes en cours, réessayez'}), 503, {'Retry-After': '1'}
 
     if success:
+        if 'quota' in data:
+            db.set_user_quota(user_id, quota)
+            quota_manager.invalidate(user_id)
         return jsonify({'success': True})
     return jsonify({'error': 'Erreur lors de la mise à jour'}), 400
 
+def user_quota(data):
+    """Quota propre normalisé depuis la requête (None : limites du rôle)"""
+    return format_limits(parse_limits(data.get('quota'))) or None
+
 @app.route('/api/users/<int:user_id>', methods=['DELETE'])
 @login_required
 def delete_user(user_id):
@@ -260,7 +770,24 @@ def delete_user(user_id):
         return jsonify({'success': True})
     return jsonify({'error': 'Erreur lors de la suppression'}), 400
 
+def start_background_services():
+    """Démarre le suivi des nœuds Ollama, le catalogue, les jobs et le préchauffage des modèles"""
+    backend_pool.start()
+    model_catalog.refresh_async()
+    job_runner.start()
+
+    # Modèle par défaut et modèles préférés des utilisateurs
+    models = [os.getenv('DEFAULT_MODEL', 'phi')]
+    try:
+        models += db.get_popular_models(int(os.getenv('MODEL_WARMUP_COUNT', 3)))
+    except Exception as e:
+        app.logger.error(f'Erreur get_popular_models: {str(e)}')
+    # "auto" n'est pas un modèle : son petit palier est préchauffé à la place
+    model_manager.start([model_router.tiers[0][1] if m == AUTO else m for m in models])
+
 if __name__ == '__main__':
+    start_background_services()
+
     # Ensure logs directory exists
     os.makedirs('logs', exist_ok=True)
 
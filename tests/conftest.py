@@ -0,0 +1,81 @@
+"""Configuration commune des tests : base SQLite temporaire, sans Ollama
+
+Les variables d'environnement sont fixées avant le premier import de
+l'application : les singletons (db, quotas, scheduler...) les lisent à
+l'import, et load_dotenv() ne remplace pas une variable déjà définie.
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP_DIR = tempfile.mkdtemp(prefix='ia-chat-tests-')
+os.environ.update({
+    'DB_BACKEND': 'sqlite',
+    'SQLITE_PATH': os.path.join(TMP_DIR, 'test.db'),
+    'PREFS_CACHE_STAMP': os.path.join(TMP_DIR, 'prefs.version'),
+    # Hachage dans le processus, à coût réduit
+    'CREDENTIALS_WORKERS': '0',
+    'CREDENTIALS_SCRYPT_N': '1024',
+    # Aucun Ollama : un appel échouerait immédiatement
+    'OLLAMA_HOST': '127.0.0.1',
+    'OLLAMA_PORT': '9',
+    'OLLAMA_BACKENDS': '',
+    'OLLAMA_RETRIES': '0',
+    'QUOTA_ENABLED': 'False',
+    'RESPONSE_CACHE_ENABLED': 'False',
+    'RETRIEVAL_ENABLED': 'False',
+    'MODEL_ROUTER_TIERS': '',
+    'SLOW_REQUEST_LOG': '',
+})
+
+_usernames = (f'test{i}' for i in itertools.count())
+
+
+@pytest.fixture(scope='session')
+def database():
+    from db.database import db
+    db.init_db()
+    return db
+
+
+@pytest.fixture
+def make_user(database):
+    """Crée un utilisateur au nom unique et renvoie son id"""
+    def make(is_admin=False):
+        return database.create_user(next(_usernames), 'motdepasse', is_admin)
+    return make
+
+
+@pytest.fixture
+def app():
+    from server import app
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app, make_user):
+    """Client connecté en tant qu'utilisateur ; client.user_id"""
+    client = app.test_client()
+    client.user_id = make_user()
+    with client.session_transaction() as session:
+        session['user_id'] = client.user_id
+        session['is_admin'] = False
+    return client
+
+
+@pytest.fixture
+def admin_client(app, make_user):
+    client = app.test_client()
+    client.user_id = make_user(is_admin=True)
+    with client.session_transaction() as session:
+        session['user_id'] = client.user_id
+        session['is_admin'] = True
+    return client
@@ -0,0 +1,45 @@
+"""Corps invalides refusés avant le quota, conversation inconnue remboursée"""
+
+import pytest
+
+import server
+from quotas import QuotaManager
+
+INVALID_BODIES = [
+    None,
+    'null',
+    '[]',
+    '{}',
+    '{"message": 3}',
+    '{"message": "   "}',
+    '{"messages": []}',
+    '{"messages": [1]}',
+    '{"messages": [{"role": "user"}]}',
+]
+
+
+@pytest.fixture
+def quota(monkeypatch):
+    manager = QuotaManager(enabled=True, user_limits='requests=2/3600', admin_limits='')
+    monkeypatch.setattr(server, 'quota_manager', manager)
+    return manager
+
+
+@pytest.mark.parametrize('route', ['/api/chat', '/api/jobs'])
+@pytest.mark.parametrize('body', INVALID_BODIES)
+def test_invalid_body_is_rejected_without_charging(client, quota, route, body):
+    response = client.post(route, data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert 'X-RateLimit-Remaining-Requests' not in response.headers
+    # Le seau est intact : la prochaine requête voit encore 1 place sur 2 après elle
+    assert quota.check(client.user_id)['requests'][1] == pytest.approx(1, abs=0.01)
+
+
+@pytest.mark.parametrize('route', ['/api/chat', '/api/jobs'])
+def test_unknown_conversation_is_refunded(client, quota, route):
+    for _ in range(3):
+        response = client.post(route, json={'message': 'Bonjour', 'conversation_id': 999999})
+        assert response.status_code == 404
+        assert response.get_json() == {'error': 'Conversation introuvable'}
+        assert response.headers['X-RateLimit-Remaining-Requests'] == '2'
@@ -0,0 +1,48 @@
+import base64
+
+import pytest
+
+from db.base import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize('cursor', [
+    'WzFd',  # [1] : clé de tri sans id
+    encode_cursor(['2024-01-01 00:00:00']),
+    encode_cursor(['alice', 'bob']),
+    encode_cursor([True, 1]),
+    encode_cursor([{'a': 1}, 1]),
+    encode_cursor({'key': 'alice', 'id': 1}),
+    base64.urlsafe_b64encode(b'pas du json').decode('ascii'),
+    '%%%',
+])
+def test_decode_cursor_rejects_malformed(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('position', [['2024-01-01 00:00:00', 3], ['alice', 12], [1.5, 2]])
+def test_decode_cursor_round_trip(position):
+    assert decode_cursor(encode_cursor(position)) == position
+
+
+def test_empty_cursor_is_first_page():
+    assert decode_cursor(None) is None
+    assert decode_cursor('') is None
+
+
+def test_users_route_rejects_malformed_cursor(admin_client):
+    response = admin_client.get('/api/users', query_string={'cursor': 'WzFd'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Curseur de pagination invalide'}
+
+
+def test_users_route_follows_cursor(admin_client, make_user):
+    for _ in range(3):
+        make_user()
+    first = admin_client.get('/api/users', query_string={'limit': 2}).get_json()
+    assert len(first['users']) == 2 and first['next_cursor']
+
+    second = admin_client.get('/api/users', query_string={'limit': 2, 'cursor': first['next_cursor']})
+    assert second.status_code == 200
+    ids = {user['id'] for user in first['users']}
+    assert ids.isdisjoint(user['id'] for user in second.get_json()['users'])
@@ -0,0 +1,33 @@
+"""Invalidation des préférences en cache entre workers (tampon partagé)"""
+
+import pytest
+
+from db.sqlite_backend import SQLiteDatabase
+
+
+@pytest.fixture
+def workers(database):
+    # Deux processus gunicorn simulés : même base, même tampon, caches séparés
+    return SQLiteDatabase(), SQLiteDatabase()
+
+
+def test_update_is_seen_by_other_worker(workers, make_user):
+    worker_a, worker_b = workers
+    user_id = make_user()
+    assert worker_b.get_user_preferences(user_id)['model'] == 'phi'
+
+    worker_a.update_preferences(user_id, {'model': 'llama3'})
+    assert worker_b.get_user_preferences(user_id)['model'] == 'llama3'
+
+
+def test_own_bump_keeps_other_workers_invalidations(workers, make_user):
+    worker_a, worker_b = workers
+    first, second = make_user(), make_user()
+    worker_b.get_user_preferences(first)
+
+    worker_a.update_preferences(first, {'model': 'llama3'})
+    # B invalide à son tour avant d'avoir relu : l'invalidation de A ne doit pas se perdre
+    worker_b.update_preferences(second, {'model': 'mistral'})
+
+    assert worker_b.get_user_preferences(first)['model'] == 'llama3'
+    assert worker_a.get_user_preferences(second)['model'] == 'mistral'
@@ -0,0 +1,66 @@
+import pytest
+
+from quotas import REQUESTS, TOKENS, QuotaExceeded, QuotaManager, parse_limits, quota_headers
+
+
+def test_parse_limits():
+    assert parse_limits('requests=30/60, tokens=50000/3600') == {
+        REQUESTS: (30.0, 60.0),
+        TOKENS: (50000.0, 3600.0)
+    }
+    assert parse_limits('requests=10') == {REQUESTS: (10.0, 60.0)}
+    assert parse_limits('') == {}
+
+
+@pytest.mark.parametrize('value', ['requests=abc/60', 'requests=0/60', 'calls=10/60'])
+def test_parse_limits_rejects_invalid(value):
+    with pytest.raises(ValueError) as error:
+        parse_limits(value)
+    assert error.value.__cause__ is None
+
+
+def test_check_counts_requests_until_exhausted(database, make_user):
+    manager = QuotaManager(enabled=True, user_limits='requests=2/3600', admin_limits='')
+    user_id = make_user()
+
+    state = manager.check(user_id)
+    headers = quota_headers(state)
+    assert headers['X-RateLimit-Limit-Requests'] == '2'
+    assert headers['X-RateLimit-Remaining-Requests'] == '1'
+
+    manager.check(user_id)
+    with pytest.raises(QuotaExceeded) as error:
+        manager.check(user_id)
+    assert error.value.retry_after >= 1
+    headers = quota_headers(error.value.state, error.value.retry_after)
+    assert headers['X-RateLimit-Remaining-Requests'] == '0'
+    assert headers['Retry-After'] == str(error.value.retry_after)
+
+
+def test_refund_gives_the_request_back(database, make_user):
+    manager = QuotaManager(enabled=True, user_limits='requests=2/3600', admin_limits='')
+    user_id = make_user()
+
+    state = manager.check(user_id)
+    state = manager.refund(user_id, False, state)
+    assert quota_headers(state)['X-RateLimit-Remaining-Requests'] == '2'
+    # Le seau ne dépasse jamais sa capacité
+    assert manager.check(user_id)[REQUESTS][1] == pytest.approx(1, abs=0.01)
+
+
+def test_tokens_are_charged_after_generation(database, make_user):
+    manager = QuotaManager(enabled=True, user_limits='tokens=100/3600', admin_limits='')
+    user_id = make_user()
+
+    manager.check(user_id)
+    manager.charge(user_id, False, {'eval_count': 150})
+    with pytest.raises(QuotaExceeded) as error:
+        manager.check(user_id)
+    assert error.value.bucket == TOKENS
+
+
+def test_admins_without_limits_are_exempt(database, make_user):
+    manager = QuotaManager(enabled=True, user_limits='requests=1/3600', admin_limits='')
+    admin_id = make_user(is_admin=True)
+    for _ in range(3):
+        assert manager.check(admin_id, is_admin=True) == {}
@@ -0,0 +1,22 @@
+import pytest
+
+from router import DEFAULT_TIERS, ModelRouter, parse_tiers
+
+
+def test_blank_tiers_fall_back_to_default(monkeypatch):
+    monkeypatch.setenv('MODEL_ROUTER_TIERS', '')
+    router = ModelRouter()
+    assert router.tiers == parse_tiers(DEFAULT_TIERS)
+    assert router.classify('Bonjour')[0] == 'small'
+
+
+def test_tiers_without_any_model_are_rejected():
+    with pytest.raises(ValueError):
+        ModelRouter(tiers='small,medium')
+
+
+def test_code_goes_to_large_tier():
+    router = ModelRouter(tiers='small:phi,medium:mistral,large:llama3')
+    tier, reasons = router.classify('```python\ndef f():\n    return 1\n```')
+    assert tier == 'large'
+    assert 'code' in reasons
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import random
+import inspect
+import pstats
+import cProfile
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import WatchedFileHandler
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Chronomètre de la requête en cours (None hors requête : les spans sont ignorés)
+_current = contextvars.ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    """Durées cumulées par span pour une requête"""
+
+    def __init__(self, route, method):
+        self.route = route
+        self.method = method
+        self.start = time.perf_counter()
+        self.spans = {}
+        self.status = None
+        self.profile = None
+
+    def add(self, name, duration):
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + duration, count + 1)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+        entries = [
+            f'{name};dur={total * 1000:.1f}' + (f';desc="x{count}"' if count > 1 else '')
+            for name, (total, count) in self.spans.items()
+        ]
+        entries.append(f'app;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def span(name):
+    """Mesure un bloc et l'ajoute à la requête en cours"""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - start)
+
+
+def instrument(obj, prefix, methods=None):
+    """Enveloppe les méthodes publiques d'un objet dans des spans prefix.méthode
+
+    Les appels internes passent aussi par l'instance : un span imbriqué
+    (get_connection dans get_users) apparaît séparément dans la répartition.
+    """
+    names = methods or [name for name, member in inspect.getmembers(type(obj), inspect.isfunction)
+                        if not name.startswith('_')]
+    for name in names:
+        setattr(obj, name, _timed(getattr(obj, name), f'{prefix}.{name}'))
+    return obj
+
+
+def _timed(method, name):
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+        timer = _current.get()
+        if timer is None:
+            return method(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timer.add(name, time.perf_counter() - start)
+    return timed
+
+
+class RequestTracer:
+    """Répartition du temps par requête, journal des requêtes lentes et profils
+
+    Un profil cProfile est pris pour une fraction des requêtes, et pour la
+    requête suivante d'une route qui vient d'être lente. Un seul profil à la
+    fois par processus : cProfile ne supporte pas deux profileurs actifs.
+    """
+
+    def __init__(self, header=None, slow_ms=None, log_path=None, sample_rate=None,
+                 profile_slow=None, profile_min_ms=None, profile_dir=None):
+        # Exposition de Server-Timing : all, admin ou off
+        self.header = (header or os.getenv('SERVER_TIMING', 'admin')).lower()
+        self.slow_ms = float(slow_ms or os.getenv('SLOW_REQUEST_MS', 2000))
+        self.log_path = log_path if log_path is not None else os.getenv('SLOW_REQUEST_LOG', 'logs/slow_requests.log')
+        self.sample_rate = float(sample_rate or os.getenv('PROFILE_SAMPLE_RATE', 0))
+        if profile_slow is None:
+            profile_slow = os.getenv('PROFILE_SLOW', 'False').lower() == 'true'
+        self.profile_slow = profile_slow
+        # Profils conservés seulement au-delà de cette durée
+        self.profile_min_ms = float(profile_min_ms or os.getenv('PROFILE_MIN_MS', 0))
+        self.profile_dir = profile_dir or os.getenv('PROFILE_DIR', 'logs/profiles')
+
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()
+        self._armed = set()
+        self._log = None
+
+    def start(self, route, method):
+        timer = RequestTimer(route, method)
+        _current.set(timer)
+        if self._should_profile(route) and self._profiling.acquire(blocking=False):
+            timer.profile = cProfile.Profile()
+            try:
+                timer.profile.enable()
+            except ValueError:
+                # Un autre profileur (débogueur, outil externe) est déjà actif
+                timer.profile = None
+                self._profiling.release()
+        return timer
+
+    def _should_profile(self, route):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self._armed:
+            with self._lock:
+                if route in self._armed:
+                    self._armed.discard(route)
+                    return True
+        return False
+
+    def show_header(self, is_admin):
+        return self.header == 'all' or (self.header == 'admin' and is_admin)
+
+    def finish(self, timer):
+        """Fin de la requête (après la fin du flux pour les réponses en streaming)"""
+        _current.set(None)
+        duration_ms = timer.elapsed() * 1000
+
+        profile_path = None
+        if timer.profile is not None:
+            timer.profile.disable()
+            self._profiling.release()
+            if duration_ms >= self.profile_min_ms:
+                profile_path = self._dump_profile(timer, duration_ms)
+
+        if duration_ms < self.slow_ms:
+            return
+        if self.profile_slow and profile_path is None:
+            with self._lock:
+                self._armed.add(timer.route)
+        self._write({
+            'event': 'slow_request',
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'route': timer.route,
+            'method': timer.method,
+            'status': timer.status,
+            'duration_ms': round(duration_ms, 1),
+            'spans': {
+                name: {'ms': round(total * 1000, 1), 'count': count}
+                for name, (total, count) in sorted(timer.spans.items(), key=lambda item: -item[1][0])
+            },
+            'profile': profile_path
+        })
+
+    def _dump_profile(self, timer, duration_ms):
+        route = timer.route.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'index'
+        path = os.path.join(
+            self.profile_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{timer.method}-{route}-{duration_ms:.0f}ms-{os.getpid()}.pstats"
+        )
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            pstats.Stats(timer.profile).dump_stats(path)
+        except (OSError, TypeError) as e:
+            # TypeError : profil vide (aucune fonction appelée)
+            logger.warning(f'Erreur écriture du profil {path}: {str(e)}')
+            return None
+        return path
+
+    def _write(self, record):
+        """Une ligne JSON par requête lente"""
+        if self._log is None:
+            with self._lock:
+                if self._log is None:
+                    self._log = logging.getLogger('slow_requests')
+                    self._log.propagate = not self.log_path
+                    if self.log_path:
+                        os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+                        handler = WatchedFileHandler(self.log_path)
+                        handler.setFormatter(logging.Formatter('%(message)s'))
+                        self._log.addHandler(handler)
+                    self._log.setLevel(logging.INFO)
+        self._log.info(json.dumps(record, ensure_ascii=False))
+
+
+# Traceur partagé par les hooks de server.py
+request_tracer = RequestTracer()
@@ -4,4 +4,13 @@ import os
 # Ajouter le répertoire de l'application au path Python
 sys.path.insert(0, os.path.dirname(__file__))
 
-from server import app as application
+from server import app as application, start_background_services
+from db.database import db
+
+# Une seule requête quand le schéma est à jour
+db.init_db()
+
+# Sous serve.py, l'application est chargée dans le maître avant le fork :
+# les threads d'arrière-plan démarrent dans chaque worker (post_worker_init)
+if os.getenv('WSGI_SERVICES_AFTER_FORK', 'False').lower() != 'true':
+    start_background_services()